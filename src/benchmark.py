@@ -0,0 +1,179 @@
+import argparse
+import contextlib
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import sys
+from timeit import default_timer as timer
+
+import numpy as np
+
+import objects.primitives as prim
+import objects.profiling as profiling
+from objects.simulator import path_commands, simulate
+from solve import solve
+
+# pipeline and parameters of each benchmark (see solve), small enough to run every file in a few minutes
+BENCHMARKS = {
+    "naive": ("naive", {}),
+    "greedy": ("greedy", {}),
+    "hill_climbing": ("greedy+hc", {"hc_iterations": 200}),
+    "local_search": ("greedy+ls", {"ls_iterations": 2000}),
+    "simulated_annealing": ("greedy+sa", {"sa_iterations": 200}),
+    "iterative_simulated_annealing": ("greedy+isa", {"isa_iterations": 3, "sa_iterations": 100}),
+    "genetic_algorithm": ("ga", {"generations": 5, "population": 10}),
+}
+
+# measures compared with the baseline, and whether a higher value is a regression
+MEASURES = {"time": True, "peak_rss_mb": True, "evaluations_per_second": False, "official_score": False}
+
+
+def run_benchmark(input_file: str, benchmark: str, seed: int) -> dict:
+    """
+    Runs a benchmark on a file, on a new process so its peak memory and caches are not shared with other runs
+
+    :param input_file: path to the .in file
+    :param benchmark: name of the benchmark (see BENCHMARKS)
+    :param seed: seed of the random generators
+    :return: dictionary with the measures of the run
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_run, (input_file, benchmark, seed))
+
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident memory of the process, 0.0 where the resource module doesn't exist (Windows)
+
+    :return: peak resident memory in megabytes
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run(input_file: str, benchmark: str, seed: int) -> dict:
+    """
+    Runs a benchmark (see run_benchmark), on its own process
+
+    :param input_file: path to the .in file
+    :param benchmark: name of the benchmark (see BENCHMARKS)
+    :param seed: seed of the random generators
+    :return: dictionary with the measures of the run
+    """
+    pipeline, parameters = BENCHMARKS[benchmark]
+    prim.Problem.read(input_file)  # compiles the problem if needed, the timed run only maps it
+
+    # the benchmarks don't use other processes, so the profiler measures the whole run
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), profiling.profile() as profiler:
+        start = timer()
+        solution = solve(input_file, pipeline, seed=seed, **parameters)
+        elapsed = timer() - start
+    metrics = profiler.metrics()
+    evaluations = metrics["timers"].get("evaluation", {}).get("calls", 0)
+
+    result = simulate(solution.problem, path_commands(solution.solution)).result()
+    return {
+        "file": os.path.basename(input_file),
+        "benchmark": benchmark,
+        "pipeline": pipeline,
+        "parameters": parameters,
+        "seed": seed,
+        "time": elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+        "evaluations": evaluations,
+        "evaluations_per_second": evaluations / elapsed if elapsed else 0.0,
+        "score": solution.score,
+        "penalty": solution.penalty,
+        "official_score": result["score"],
+        "valid": result["valid"],
+        "profile": metrics,
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    Compares the results of some runs with the runs of a baseline on the same files and benchmarks
+
+    :param results: measures of each run
+    :param baseline: measures of each run of the baseline
+    :param tolerance: relative change of a measure allowed before it is a regression (0.2 is 20%)
+    :return: description of every regression
+    """
+    previous = {(run["file"], run["benchmark"]): run for run in baseline}
+    regressions = []
+    for run in results:
+        before = previous.get((run["file"], run["benchmark"]))
+        if before is None:
+            continue
+        for measure, higher_is_worse in MEASURES.items():
+            old, new = before[measure], run[measure]
+            change = (new - old) / abs(old) if old else 0.0
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions.append("{0} | {1} | {2}: {3:.4g} -> {4:.4g} ({5:+.1%})"
+                                   .format(run["file"], run["benchmark"], measure, old, new, change))
+        if before["valid"] and not run["valid"]:
+            regressions.append("{0} | {1} | the solution is no longer valid".format(run["file"], run["benchmark"]))
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line interface of the benchmarks
+
+    :param argv: command line arguments, defaults to sys.argv
+    :return: exit status, 1 if any measure regressed from the baseline
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the algorithms on every input file")
+    parser.add_argument("-f", "--files", nargs="+", default=sorted(glob.glob("input_data/*.in")),
+                        help="paths of the .in files (default: every file in input_data)")
+    parser.add_argument("-b", "--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS),
+                        help="benchmarks to run (default: all of them)")
+    parser.add_argument("-s", "--seed", type=int, default=5, help="seed of the random generators (default: 5)")
+    parser.add_argument("-o", "--output", help="path of the JSON file with the results")
+    parser.add_argument("--baseline", help="path of the JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative change of a measure allowed by the comparison (default: 0.2)")
+    arguments = parser.parse_args(argv)
+
+    results = []
+    for input_file in arguments.files:
+        for benchmark in arguments.benchmarks:
+            run = run_benchmark(input_file, benchmark, arguments.seed)
+            results.append(run)
+            print("{file} | {benchmark} | Time: {time:.3f} s | Peak RSS: {peak_rss_mb:.1f} MB | "
+                  "Evaluations/s: {evaluations_per_second:.1f} | Score: {score} | Official Score: {official_score}"
+                  .format(**run), flush=True)
+
+    if arguments.output:
+        report = {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpus": os.cpu_count(),
+            "results": results,
+        }
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline) as file:
+            regressions = compare(results, json.load(file)["results"], arguments.tolerance)
+        print("{0} regressions from {1}".format(len(regressions), arguments.baseline))
+        for regression in regressions:
+            print("  " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import os
 import sys
 from typing import Union
 from timeit import default_timer as timer
@@ -59,10 +60,10 @@ def cooling_function():
             return choice
 
 
-def _greedy() -> prim.Chromosome:
+def _greedy(problem: prim.Problem) -> prim.Chromosome:
     menu_header("Greedy Solution")
     start = timer()
-    solution = greedy.greedy_solution(True)
+    solution = greedy.greedy_solution(problem, True)
     solution.update_internal()
     end_greedy = timer()
     print(repr(solution))
@@ -71,10 +72,10 @@ def _greedy() -> prim.Chromosome:
     return solution
 
 
-def _naive() -> prim.Chromosome:
+def _naive(problem: prim.Problem) -> prim.Chromosome:
     menu_header("Naive Solution")
     start = timer()
-    solution = dat.naive_solution()
+    solution = dat.naive_solution(problem)
     solution.update_internal()
     end_greedy = timer()
     print(repr(solution))
@@ -83,21 +84,41 @@ def _naive() -> prim.Chromosome:
     return solution
 
 
-def _genetic() -> None:
+def _genetic(problem: prim.Problem) -> None:
     generations = read_input("-> Number of Generations\n> ")
     initial_pop = read_input("-> Initial Population\n> ")
     r_cross = read_input("-> Crossover Rate\n> ", upper=(1, True), integer=False)
     r_mut = read_input("-> Mutation Rate\n> ", upper=(1, True), integer=False)
+    workers = read_input("-> Number of Processes (1 to run in this process)\n> ", upper=(os.cpu_count(), True))
 
     print("Starting Genetic Algorithm")
     start = timer()
-    best, best_score = gen.genetic_algorithm(generations, initial_pop, r_cross, r_mut)
+    best, best_score = gen.genetic_algorithm(problem, generations, initial_pop, r_cross, r_mut, workers)
     print("Out of Genetic")
     end_greedy = timer()
     print(repr(best))
     print("Took:", (end_greedy - start), "seconds")
 
 
+def _island_genetic(problem: prim.Problem) -> None:
+    generations = read_input("-> Number of Generations\n> ")
+    initial_pop = read_input("-> Population of each Island\n> ")
+    r_cross = read_input("-> Crossover Rate\n> ", upper=(1, True), integer=False)
+    r_mut = read_input("-> Mutation Rate\n> ", upper=(1, True), integer=False)
+    islands = read_input("-> Number of Islands (Processes)\n> ")
+    interval = read_input("-> Generations between Migrations\n> ")
+    migrants = read_input("-> Migrants per Island\n> ", upper=(initial_pop, True))
+    topology = migration_topology()
+
+    print("Starting Island Genetic Algorithm with", islands, "islands...")
+    start = timer()
+    best, best_score, _ = gen.island_genetic_algorithm(problem, generations, initial_pop, r_cross, r_mut, islands,
+                                                       interval, migrants, topology)
+    end_greedy = timer()
+    print(repr(best))
+    print("Took:", (end_greedy - start), "seconds")
+
+
 # --- Optimization Menus
 def _sim_an(initial):
     iterations = read_input("-> Number of Iterations for Simulated Annealing\n> ")
@@ -126,6 +147,19 @@ def _it_sim_an(initial: prim.Chromosome) -> None:
     print("Took:", (end_greedy - start), "seconds")
 
 
+def _par_sim_an(initial: prim.Chromosome) -> None:
+    iterations = read_input("-> Number of Iterations to repeat Simulated Annealing\n> ")
+    sa_iterations = read_input("-> Number of Iterations for Simulated Annealing\n> ")
+    chains = read_input("-> Number of Chains (Processes)\n> ")
+
+    print("Starting Parallel Simulated Annealing with", chains, "chains...")
+    start = timer()
+    best = heur.parallel_simulated_annealing(initial, None, iterations, sa_iterations, chains=chains)
+    end_greedy = timer()
+    print(repr(best))
+    print("Took:", (end_greedy - start), "seconds")
+
+
 def _hill_climbing(initial: prim.Chromosome) -> None:
     iterations = read_input("-> Number of Iterations for Hill Climbing\n> ",)
 
@@ -138,6 +172,20 @@ def _hill_climbing(initial: prim.Chromosome) -> None:
 # -----
 
 
+def migration_topology():
+    while True:
+        print("-> Select Migration Topology")
+
+        menu = {
+            0: ["Ring", "ring"],
+            1: ["All to All", "all"]
+        }
+
+        choice = _process_choice(menu)
+        if choice is not None:
+            return choice
+
+
 def menu_header(header: str) -> None:
     print()
     print(len(header)*"-")
@@ -155,7 +203,7 @@ def _process_choice(menu: dict[int, list]) -> str:
     return menu[choice][1] if choice in menu.keys() else None
 
 
-def select_input() -> bool:
+def select_input() -> Union[prim.Problem, None]:
     while True:
         menu_header("select data input")
 
@@ -171,88 +219,105 @@ def select_input() -> bool:
         choice = _process_choice(menu)
         if choice is not None:
             print("Reading File...")
-            prim.Problem.read_file(choice)
+            problem = prim.Problem.read(choice)
             print("Read File", choice)
-            return True
+            return problem
         else:
-            return False
+            return None
 
 
 def greedy_hill_climbing() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _greedy()
+    solution = _greedy(problem)
     _hill_climbing(solution)
     pause()
 
 
 def greedy_sim_an() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _greedy()
+    solution = _greedy(problem)
     _sim_an(solution)
     pause()
 
 
 def greedy_it_sim_an() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _greedy()
+    solution = _greedy(problem)
     _it_sim_an(solution)
     pause()
 
 
+def greedy_par_sim_an() -> None:
+    problem = select_input()
+    if not problem: return
+
+    solution = _greedy(problem)
+    _par_sim_an(solution)
+    pause()
+
+
 def greedy_non_opt() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    _greedy()
+    _greedy(problem)
     pause()
 
 
 def naive_hill_climbing() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _naive()
+    solution = _naive(problem)
     _hill_climbing(solution)
     pause()
 
 
 def naive_sim_an() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _naive()
+    solution = _naive(problem)
     _sim_an(solution)
     pause()
 
 
 def naive_it_sim_an() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    solution = _naive()
+    solution = _naive(problem)
     _it_sim_an(solution)
     pause()
 
 
 def naive_non_opt() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
 
-    _naive()
+    _naive(problem)
     pause()
 
 
 def genetic() -> None:
-    path = select_input()
-    if not path: return
+    problem = select_input()
+    if not problem: return
+
+    _genetic(problem)
+    pause()
+
+
+def island_genetic() -> None:
+    problem = select_input()
+    if not problem: return
 
-    _genetic()
+    _island_genetic(problem)
     pause()
 
 
@@ -270,6 +335,8 @@ def main_menu() -> str:
             7: ["Naive Solution - Iterative Simulated Annealing", naive_it_sim_an],
             8: ["Naive Solution - Non-Optimized", naive_non_opt],
             9: ["Genetic Algorithms", genetic],
+            10: ["Genetic Algorithms - Islands", island_genetic],
+            11: ["Greedy Solution - Parallel Simulated Annealing", greedy_par_sim_an],
             0: ["Exit", exit]
         }
 
@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Compiled problems are stored next to their .in file as a single .npy file of int32 values, named after the hash of
+# the contents of the .in file: a header with the format version and the offset and shape of every array, followed by
+# the arrays themselves. Loading maps the file in memory, so the processes solving the same problem share its pages
+VERSION = 1
+ARRAYS = ('header', 'weights', 'warehouse_positions', 'stock', 'order_positions', 'order_offsets', 'order_products',
+          'order_quantities', 'distances')
+
+
+def cache_path(file_path: str, content: bytes) -> str:
+    """
+    Path of the compiled problem of a .in file
+
+    :param file_path: path to the .in file
+    :param content: contents of the .in file
+    :return: path to the compiled problem
+    """
+    return "{0}.{1}.npy".format(file_path, hashlib.sha1(content).hexdigest()[:16])
+
+
+def load(file_path: str, content: bytes) -> dict[str, np.ndarray]:
+    """
+    Maps the compiled problem of a .in file in memory
+
+    :param file_path: path to the .in file
+    :param content: contents of the .in file
+    :return: read-only arrays of the problem (see Problem.parse_arrays), None if there is no compiled problem
+    """
+    return read(cache_path(file_path, content))
+
+
+def read(path: str) -> dict[str, np.ndarray]:
+    """
+    Maps a compiled problem in memory
+
+    :param path: path to the compiled problem
+    :return: read-only arrays of the problem (see Problem.parse_arrays), None if the file is missing or invalid
+    """
+    try:
+        values = np.asarray(np.load(path, mmap_mode='r'))  # plain arrays over the mapping, without memmap overheads
+    except (OSError, ValueError):
+        return None
+    if values.dtype != np.int32 or values.ndim != 1 or len(values) < 2 or values[0] != VERSION:
+        return None
+
+    arrays = {}
+    for i, name in enumerate(ARRAYS):
+        offset, rows, columns = values[1 + 3 * i:4 + 3 * i].tolist()
+        shape = (rows,) if columns < 0 else (rows, columns)
+        arrays[name] = values[offset:offset + int(np.prod(shape))].reshape(shape)
+    return arrays
+
+
+def save(file_path: str, content: bytes, arrays: dict[str, np.ndarray]) -> bool:
+    """
+    Writes the compiled problem of a .in file, replacing the ones of older contents of the file. The file is written
+    to a temporary file first, so processes loading it at the same time never see it incomplete
+
+    :param file_path: path to the .in file
+    :param content: contents of the .in file
+    :param arrays: arrays of the problem (see Problem.parse_arrays), including the distances
+    :return: True if the file was written, False if the directory is not writable
+    """
+    header = [VERSION]
+    offset = 1 + 3 * len(ARRAYS)
+    for name in ARRAYS:
+        shape = arrays[name].shape
+        header += [offset, shape[0], shape[1] if len(shape) > 1 else -1]
+        offset += arrays[name].size
+    values = np.concatenate([np.array(header, dtype=np.int32)] +
+                            [np.asarray(arrays[name], dtype=np.int32).ravel() for name in ARRAYS])
+
+    path = cache_path(file_path, content)
+    try:
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    except OSError:
+        return False
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            np.save(file, values)
+        os.replace(temporary, path)
+    except OSError:
+        os.remove(temporary)
+        return False
+
+    for stale in glob.glob(glob.escape(file_path) + ".*.npy"):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return True
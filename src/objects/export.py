@@ -1,21 +1,58 @@
-def export_data(drone_paths, filename) -> list[str]:
+import gzip
+import os
+import stat
+import tempfile
+
+
+def export_data(drone_paths, filename, compress: bool = None) -> int:
     """
-    Exports the Chromossome to a file
+    Exports the Chromossome to a file. The commands are written path by path through a buffer, to a temporary file
+    that replaces the file once it is complete, so a failed export never leaves a truncated file behind. A replaced
+    file keeps its permissions, a new file is only readable and writable by its owner (see tempfile.mkstemp)
     :param drone_paths: DronePaths to get the info of the path of each drone
     :param filename: Resulting file name
-    :return: List of the created commands
+    :param compress: flag to write the file with gzip, defaults to the file name ending in .gz
+    :return: Number of commands written
     """
-    f = open(filename, 'w')
-
+    if compress is None:
+        compress = filename.endswith('.gz')
     paths = [x for x in drone_paths.values()]
+    count = sum(len(path.genes) for path in paths)  # one command for each gene
 
-    commands = ["{drone_id} {type} {node} {product} {number}"
-                    .format(drone_id=step.drone_id, type="L" if step.demand > 0 else "D", node=step.node.id,
-                            product=step.product.id, number=abs(step.demand))
-                for path in paths for step in path.steps]
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                             prefix=os.path.basename(filename) + '.', suffix='.tmp')
+    try:
+        with open(descriptor, 'wb', buffering=1 << 20) as f:
+            stream = gzip.GzipFile(fileobj=f, mode='wb') if compress else f
+            stream.write(str(count).encode('ascii'))
+            for path in paths:
+                stream.write(_path_lines(path).encode('ascii'))
+            if compress:
+                stream.close()  # writes the end of the gzip stream, f stays open
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temporary, stat.S_IMODE(os.stat(filename).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return count
 
-    commands.insert(0, str(len(commands)))
 
-    f.write("\n".join(commands))
-    f.close()
-    return commands
+def _path_lines(path) -> str:
+    """
+    Commands of a DronePath, each one on a new line
+    :param path: DronePath
+    :return: text with a newline before each command
+    """
+    # node indexes of the orders come after the warehouses, the commands use the ids of each kind of node
+    n_warehouses = len(path.problem.warehouses)
+    return "".join(["\n{drone_id} {type} {node} {product} {number}"
+                   .format(drone_id=path.drone_id, type="L" if demand > 0 else "D",
+                           node=node if node < n_warehouses else node - n_warehouses, product=product,
+                           number=abs(demand))
+                    for demand, node, product in zip(path.genes.demand.tolist(), path.genes.node.tolist(),
+                                                     path.genes.product.tolist())])
@@ -1,178 +1,171 @@
-from copy import deepcopy
-
-from numpy import random
+import numpy as np
 import objects.primitives as prim
 
 
-def switch_drones(genes: list) -> list:
+def switch_drones(chromosome, touched: set, rng: np.random.Generator):
     """
     Switches the drones of 2 genes (works with None drone_id's)
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    gene1_ind = random.randint(0, len(genes))
-    drone1 = genes[gene1_ind].drone_id
+    genes: prim.GeneTable = chromosome.genes
+    gene1_ind = rng.integers(0, len(genes))
+    drone1 = int(genes.drone[gene1_ind])
 
-    dif_drones: list[(int, prim.Gene)] = list(filter(lambda x: x[1].drone_id != drone1, enumerate(genes)))
+    dif_drones = np.flatnonzero(genes.drone != drone1)
 
-    if not dif_drones:
+    if not len(dif_drones):
         return genes
 
-    gene2_ind, gene2 = dif_drones[random.randint(0, len(dif_drones))] if len(dif_drones) > 1 else dif_drones[0]
-    drone2 = gene2.drone_id
-
-    genes[gene1_ind].set_drone(drone2)
-    genes[gene2_ind].set_drone(drone1)
+    gene2_ind = dif_drones[rng.integers(0, len(dif_drones))] if len(dif_drones) > 1 else dif_drones[0]
+    drone2 = int(genes.drone[gene2_ind])
 
-    return genes
+    touched.update((drone1, drone2))
+    return genes.set_drones([gene1_ind, gene2_ind], [drone2, drone1])
 
 
-def unbalance_quantities(genes: list) -> list:
+def unbalance_quantities(chromosome, touched: set, rng: np.random.Generator):
     """
     Unbalances the quantities of 2 genes of the same WareHouse and Product
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    supplies = {}
-    for i, gene in enumerate(genes):
-        if gene.demand < 0: continue
-        if (gene.node, gene.product) not in supplies:
-            supplies[(gene.node, gene.product)] = [(i, gene)]
-        else:
-            supplies[(gene.node, gene.product)].append((i, gene))
+    genes: prim.GeneTable = chromosome.genes
+    supplies = np.flatnonzero(genes.demand >= 0)
+    keys, supplies_filter = _spot_keys(genes, supplies, len(chromosome.problem.products))
 
-    supplies_filter = {k: v for (k, v) in supplies.items() if len(v) > 1}
-
-    if not supplies_filter:  # there aren't any 2 genes with same WH and item
+    if not len(supplies_filter):  # there aren't any 2 genes with same WH and item
         return genes
 
-    index = random.randint(0, len(supplies_filter))
-    supply_genes = supplies_filter[list(supplies_filter.keys())[index]]
+    index = rng.integers(0, len(supplies_filter))
+    supply_genes = supplies[keys == supplies_filter[index]]
 
-    g1_pos = random.randint(0, len(supply_genes))
+    g1_pos = rng.integers(0, len(supply_genes))
     values = list(range(0, len(supply_genes)))
     values.remove(g1_pos)
-    g2_pos = random.choice(values)
+    g2_pos = rng.choice(values)
 
-    g1 = genes[supply_genes[g1_pos][0]]
-    g2 = genes[supply_genes[g2_pos][0]]
+    g1 = supply_genes[g1_pos]
+    g2 = supply_genes[g2_pos]
 
-    demand = g1.demand + g2.demand
-    g1.demand = random.randint(1, demand)
-    g2.demand = demand - g1.demand
+    demand = int(genes.demand[g1] + genes.demand[g2])
+    g1_demand = rng.integers(1, demand)
 
-    return genes
+    touched.update((int(genes.drone[g1]), int(genes.drone[g2])))
+    return genes.set_demands([g1, g2], [g1_demand, demand - g1_demand])
 
 
-def cleanse_genes(genes: list) -> list:
+def cleanse_genes(chromosome, touched: set, rng: np.random.Generator):
     """
     Removes genes with penalties higher than 0
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    return list(filter(lambda x: x.penalty == 0, genes))
+    genes: prim.GeneTable = chromosome.genes
+    penalized = chromosome.penalties() != 0
+    touched.update(genes.drone[penalized].tolist())
+    chromosome.release(genes.take(penalized))
+    return genes.take(~penalized)
 
 
-def pop_gene(genes: list) -> list:
+def pop_gene(chromosome, touched: set, rng: np.random.Generator):
     """
     Removes the gene with the highest penalty
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    sorted_genes = sorted(genes, key=lambda x: -x.penalty)
-    genes.remove(sorted_genes[0])
-    return genes
+    genes: prim.GeneTable = chromosome.genes
+    index = int(np.argmax(chromosome.penalties()))  # first gene with the highest penalty
+    touched.add(int(genes.drone[index]))
+    chromosome.release(genes.take([index]))
+    return genes.delete(index)
 
 
-def join_genes(genes: list) -> list:
+def join_genes(chromosome, touched: set, rng: np.random.Generator):
     """
     Merges 2 genes of the same Spot and Product, adding the quantities and choosing one of the two drone_id's
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    gene_dic = {}
-
-    for i, gene in enumerate(genes):
-        if (gene.node, gene.product) not in gene_dic:
-            gene_dic[(gene.node, gene.product)] = [(i, gene)]
-        else:
-            gene_dic[(gene.node, gene.product)].append((i, gene))
-
-    gene_filter = {k: v for (k, v) in gene_dic.items() if len(v) > 1}
+    genes: prim.GeneTable = chromosome.genes
+    keys, gene_filter = _spot_keys(genes, np.arange(len(genes)), len(chromosome.problem.products))
 
-    if not gene_filter:  # there aren't any 2 genes with same WH and item
+    if not len(gene_filter):  # there aren't any 2 genes with same WH and item
         return genes
 
-    index = random.randint(0, len(gene_filter))
-    sample_genes = gene_filter[list(gene_filter.keys())[index]]
+    index = rng.integers(0, len(gene_filter))
+    sample_genes = np.flatnonzero(keys == gene_filter[index])
 
-    g1_pos = random.randint(0, len(sample_genes))
+    g1_pos = rng.integers(0, len(sample_genes))
     values = list(range(0, len(sample_genes)))
     values.remove(g1_pos)
-    g2_pos = random.choice(values)
+    g2_pos = rng.choice(values)
 
-    g1: prim.Gene = genes[sample_genes[g1_pos][0]]
-    g2: prim.Gene = genes[sample_genes[g2_pos][0]]
+    g1 = int(sample_genes[g1_pos])
+    g2 = int(sample_genes[g2_pos])
 
-    drone_id = g1.drone_id if random.randint(0, 2) else g2.drone_id
-    demand = g1.demand + g2.demand
-    node = g1.node
-    product = g1.product
-    new_gene = prim.Gene(drone_id, demand, node, product)
+    drone_id = genes.drone[g1] if rng.integers(0, 2) else genes.drone[g2]
+    demand = genes.demand[g1] + genes.demand[g2]
+    node = genes.node[g1]
+    product = genes.product[g1]
 
-    new_gene_pos = g1_pos if random.randint(0, 2) else g2_pos
-    genes.insert(new_gene_pos, new_gene)
-    genes.remove(g1)
-    genes.remove(g2)
+    touched.update((int(genes.drone[g1]), int(genes.drone[g2])))
 
-    return genes
+    new_gene_pos = g1_pos if rng.integers(0, 2) else g2_pos
+    genes = genes.insert(new_gene_pos, drone_id, demand, node, product)
+    # the merged genes were shifted if the new gene was inserted before them
+    return genes.delete([g if g < new_gene_pos else g + 1 for g in (g1, g2)])
 
 
-def add_gene(genes: list):
+def add_gene(chromosome, touched: set, rng: np.random.Generator):
     """
-    Adds a Gene of a product available in one of the warehouses
-    :param genes: List of genes to be altered
-    :return: Altered list of genes
+    Adds a Gene of a product available in one of the warehouses (the new Gene has no drone, so no path is touched)
+    :param chromosome: Chromosome whose genes will be altered
+    :param touched: Set collecting the drone_id's whose paths were altered
+    :param rng: random generator of the mutation
+    :return: Altered table of genes
     """
-    # copy WH
-    warehouses = deepcopy(prim.Problem.warehouses)
-
-    # remover produtos que estão nos genes[]
-    for gene in genes:
-        gene_quantity = gene.demand
-        if gene_quantity < 0:    # not a WH
-            continue
-        product_id = gene.product.id
-        wh = next((wh for wh in warehouses if wh.id == gene.node.id), None)
-        assert wh
+    genes: prim.GeneTable = chromosome.genes
 
-        wh_quantity = wh.products.get(product_id)
+    # produtos que não estão nos genes[]
+    stock: prim.StockIndex = chromosome.stock()
 
-        if wh_quantity is None:
-            continue
-
-        wh.remove_products({product_id: gene_quantity})
-
-        if wh.complete():
-            warehouses.remove(wh)
+    warehouses = stock.stocked_warehouses()
+    if not len(warehouses):
+        return genes
 
     # pegar num wh e um produto e uma quantidade, criar gene
-    wh: prim.Warehouse = warehouses[random.randint(0, len(warehouses))]
-
-    product_id = random.choice(list(wh.products.keys()))
-    total = wh.products[product_id]
-
-    if total <= 0:
-        return genes
-    amount = random.randint(1, total+1) if total > 0 else 1
+    wh = warehouses[rng.integers(0, len(warehouses))]
 
-    actual_wh = next((actual_wh for actual_wh in prim.Problem.warehouses if actual_wh.id == wh.id), None)
-    assert actual_wh
-    actual_product = next((actual_pd for actual_pd in prim.Problem.products if actual_pd.id == product_id), None)
-    assert actual_product
+    product_id = rng.choice(stock.products(wh))
+    total = stock.quantity(wh, product_id)
+    amount = rng.integers(1, total + 1)
 
-    gene: prim.Gene = prim.Gene(None, amount, actual_wh, actual_product)
+    position = rng.integers(0, len(genes))
+    genes = genes.insert(position, prim.GeneTable.NO_DRONE, amount, wh, product_id)
+    chromosome.reserve(genes.take([position]))
+    return genes
 
-    genes.insert(random.randint(0, len(genes)), gene)
 
-    return genes
+def _spot_keys(genes, indexes, n_products: int) -> tuple:
+    """
+    Identifies the Spot and Product of some genes with a single key
+    :param genes: table of genes
+    :param indexes: positions of the genes
+    :param n_products: number of products of the problem
+    :return: the key of each gene and the keys shared by more than one gene, sorted by their first gene
+    """
+    keys = genes.node[indexes].astype(np.int64) * n_products + genes.product[indexes]
+    unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    duplicated = counts > 1
+    return keys, unique[duplicated][np.argsort(first[duplicated])]
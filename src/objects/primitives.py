@@ -2,8 +2,11 @@ from __future__ import annotations
 import math
 from abc import ABC, abstractmethod
 from typing import Union
-from collections import Counter
 
+import numpy as np
+
+import objects.cache as problem_cache
+import objects.profiling as profiling
 from objects.mutations import *
 from search.constraints import *
 
@@ -95,15 +98,35 @@ class Spot(ABC):
 
 
 class Warehouse(Spot):
-    def __init__(self, id: int, position: Point, products: dict[int, int]):
+    def __init__(self, id: int, position: Point, products: dict[int, int] = None, stock: np.ndarray = None):
         """
         An instance of Spot. A warehouse that holds products
         :param id: identifier of the warehouse
         :param position: Position in the map
         :param products: List of products in the warehouse
+        :param stock: quantity of every product, used to build the list of products when it is first needed
         """
+        self.__stock = stock
         super().__init__(id, position, products)
 
+    @property
+    def products(self) -> dict[int, int]:
+        """
+        Products and quantities in the warehouse
+        :return: dict {product id -> quantity}
+        """
+        if self.__products is None:
+            self.__products = dict(enumerate(self.__stock.tolist()))
+        return self.__products
+
+    @products.setter
+    def products(self, products: dict[int, int]) -> None:
+        """
+        Replaces the products in the warehouse
+        :param products: dict {product id -> quantity}
+        """
+        self.__products = products
+
     def __str__(self) -> str:
         """
         String representation of a WareHouse, including products
@@ -149,51 +172,173 @@ class Order(Spot):
         return "[ORDER {id}] - position={position}\n{products}" \
             .format(id=self.id, position=self.position, products=products)
 
-    def update_weight(self) -> None:
+    def update_weight(self, products: list[Product]) -> None:
         """
         updates the order weight based on the product list
+        :param products: products of the problem, sorted by id
         """
-        self.product_weight = sum(Problem.get_product(p).weight * q for p, q in self.products.items())
+        self.product_weight = sum(products[p].weight * q for p, q in self.products.items())
 
 
 class Problem:
-    rows: int = None
-    cols: int = None
-    drones: int = None
-    turns: int = None
-    payload: int = None
-    warehouses: list[Warehouse] = None
-    orders: list[Order] = None
-    products: list[Product] = None
+    def __init__(self, rows: int, cols: int, drones: int, turns: int, payload: int, warehouses: list[Warehouse],
+                 orders: list[Order], products: list[Product], weights: np.ndarray, stock: np.ndarray,
+                 positions: np.ndarray, file_path: str = None, cache_file: str = None, distances: np.ndarray = None):
+        """
+        An instance of the problem, read from a .in file (see read). It can't be changed after it is created, so it
+        can be shared by every solution, thread and search of the same instance. Its arrays are made read-only,
+        whether they were parsed or mapped from the compiled file
+        :param rows: number of rows of the map
+        :param cols: number of columns of the map
+        :param drones: number of drones
+        :param turns: maximum number of turns
+        :param payload: maximum payload of a drone
+        :param warehouses: warehouses, sorted by id
+        :param orders: orders, sorted by id
+        :param products: products, sorted by id
+        :param weights: weight of each product
+        :param stock: initial quantity of each product (columns) on each warehouse (rows)
+        :param positions: x and y of each node (see get_node)
+        :param file_path: path to the .in file
+        :param cache_file: compiled problem mapped in memory, None if the file was parsed (see objects.cache)
+        :param distances: distance matrix, built when first needed if None (see distances)
+        """
+        values = dict(rows=rows, cols=cols, drones=drones, turns=turns, payload=payload, warehouses=warehouses,
+                      orders=orders, products=products, weights=Problem.__read_only(weights),
+                      stock=Problem.__read_only(stock), positions=Problem.__read_only(positions), file_path=file_path,
+                      cache_file=cache_file, _distances=Problem.__read_only(distances))
+        self.__dict__.update(values)
 
-    @staticmethod
-    def get_product(product_id: int) -> Product:
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError("Problem instances can't be changed")
+
+    def __getstate__(self) -> dict:
+        """
+        State sent to another process, a compiled problem is mapped again by the other process instead, sharing the
+        pages of its distance matrix
+        :return: dictionary with the values of the Problem
+        """
+        state = dict(self.__dict__)
+        if self.cache_file:
+            state['_distances'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Fills the values of a Problem sent by another process (see __getstate__)
+        :param state: dictionary with the values of the Problem
+        """
+        self.__dict__.update(state)
+        if self.cache_file and self._distances is None:
+            arrays = problem_cache.read(self.cache_file)
+            self.__dict__['_distances'] = None if arrays is None else arrays['distances']
+        for name in ('weights', 'stock', 'positions', '_distances'):  # the arrays unpickled can be written
+            Problem.__read_only(state[name])
+
+    def get_product(self, product_id: int) -> Product:
         """
         Retrieve a Product by its id
         :param product_id: identifier of the product
         :return: Product retrieved
         """
-        return Problem.products[product_id]
+        return self.products[product_id]
+
+    def get_node(self, index: int) -> Spot:
+        """
+        Retrieve a Warehouse or an Order by its node index, the warehouses come first followed by the orders
+        :param index: node index
+        :return: Warehouse or Order retrieved
+        """
+        if index < len(self.warehouses):
+            return self.warehouses[index]
+        return self.orders[index - len(self.warehouses)]
+
+    def node_index(self, node: Spot) -> int:
+        """
+        Calculates the node index of a Warehouse or an Order
+        :param node: Warehouse or Order
+        :return: node index
+        """
+        if isinstance(node, Warehouse):
+            return node.id
+        return len(self.warehouses) + node.id
+
+    def distances(self) -> np.ndarray:
+        """
+        Distance between every pair of nodes (see get_node). The matrix is built on the first call
+        :return: square matrix indexed by node index
+        """
+        if self._distances is None:
+            self.__dict__['_distances'] = Problem.__read_only(Problem.distance_matrix(self.positions))
+        return self._distances
 
     @staticmethod
-    def calculate_points(turn: int) -> int:
+    def __read_only(array: np.ndarray) -> np.ndarray:
+        """
+        Prevents writing to an array kept by the Problem
+        :param array: the array, or None
+        :return: the same array
+        """
+        if array is not None:
+            array.flags.writeable = False
+        return array
+
+    @staticmethod
+    def distance_matrix(positions: np.ndarray) -> np.ndarray:
+        """
+        Distance between every pair of positions, as calculated by Point.distance
+        :param positions: x and y of each position
+        :return: square matrix of distances
+        """
+        x, y = positions.T.astype(np.float64)
+        squared = (x[:, None] - x[None, :]) ** 2 + (y[:, None] - y[None, :]) ** 2
+        return np.ceil(np.sqrt(squared)).astype(np.int32)
+
+    def calculate_points(self, turn: int) -> int:
         """
         Calculates the points given the turns
         :param turn: turns
         :return: score
         """
-        return math.ceil(((Problem.turns - turn) / Problem.turns) * 100)
+        return math.ceil(((self.turns - turn) / self.turns) * 100)
 
     @staticmethod
-    def read_file(file_path: str) -> None:
+    def read(file_path: str, use_cache: bool = True) -> Problem:
         """
-        Reads a file and fills the Problems values
+        Reads a file into a new Problem. The file is compiled to a binary file next to it on the first read (see
+        objects.cache), the next reads of the same contents map that file in memory instead of parsing
         :param file_path: path to the .in file
-        """
-        [Problem.rows, Problem.cols, Problem.drones, Problem.turns, Problem.payload, Problem.warehouses, Problem.orders,
-         Problem.products] = Problem.parse_file(file_path)
-        for order in Problem.orders:
-            order.update_weight()
+        :param use_cache: flag to read and write the compiled problem
+        :return: the Problem read
+        """
+        with open(file_path, 'rb') as file:
+            content = file.read()
+
+        arrays = problem_cache.load(file_path, content) if use_cache else None
+        cache_file = None if arrays is None else problem_cache.cache_path(file_path, content)
+        if arrays is None:
+            arrays = Problem.parse_content(content.decode())
+            if use_cache:
+                positions = np.concatenate((arrays['warehouse_positions'], arrays['order_positions']))
+                if problem_cache.save(file_path, content, {**arrays, 'distances': Problem.distance_matrix(positions)}):
+                    arrays = problem_cache.load(file_path, content)
+                    cache_file = problem_cache.cache_path(file_path, content)
+        for array in arrays.values():  # before the warehouses take views of the stock
+            Problem.__read_only(array)
+
+        warehouses, orders, products = Problem.build_objects(arrays)
+
+        # same as Order.update_weight, for every order at once
+        weights = arrays['weights'][arrays['order_products']].astype(np.int64) * arrays['order_quantities']
+        order_weights = np.zeros(len(orders), dtype=np.int64)
+        np.add.at(order_weights, np.repeat(np.arange(len(orders)), np.diff(arrays['order_offsets'])), weights)
+        for order, weight in zip(orders, order_weights.tolist()):
+            order.product_weight = weight
+
+        return Problem(*arrays['header'].tolist(), warehouses, orders, products,
+                       arrays['weights'].astype(np.int64), arrays['stock'].astype(np.int32, copy=False),
+                       np.concatenate((arrays['warehouse_positions'], arrays['order_positions'])),
+                       file_path, cache_file, arrays.get('distances'))
 
     @staticmethod
     def parse_file(filename: str) -> tuple[int, int, int, int, int, list[Warehouse], list[Order], list[Product]]:
@@ -202,47 +347,189 @@ class Problem:
         :param filename: path to the .in file
         :return: data
         """
+        arrays = Problem.parse_arrays(filename)
+        return (*arrays['header'], *Problem.build_objects(arrays))
+
+    @staticmethod
+    def parse_arrays(filename: str) -> dict[str, np.ndarray]:
+        """
+        Parsing of the .in file into integer arrays (see parse_content)
+
+        :param filename: path to the .in file
+        :return: parsed arrays
+        """
         with open(filename, 'r') as file:
-            # header
-            n_rows, n_cols, n_drones, max_turns, max_payload = [int(x) for x in file.readline().split(" ")]
-
-            # products
-            n_products = int(file.readline())
-            product_weights = list(map(int, file.readline().split(" ")))
-            # to ensure the number of products corresponds to the actual read weights
-            assert n_products == len(product_weights)
-            products = [Product(i, weight) for i, weight in enumerate(product_weights)]
-
-            # warehouses
-            num_warehouses = int(file.readline())
-            warehouses = []
-            for i in range(num_warehouses):
-                x, y = map(int, file.readline().split(" "))
-                n_products_warehouse = list(map(int, file.readline().split(" ")))
-                # to ensure the products are listed on the warehouse
-                assert n_products == len(n_products_warehouse)
-                # stores the warehouse products on a dict {Product -> quantity: int}
-                warehouse_products = {product.id: n for product, n in zip(products, n_products_warehouse)}
-                warehouse = Warehouse(i, Point(x, y), warehouse_products)
-                warehouses.append(warehouse)
-
-            # order
-            order_list = []
-            n_orders = int(file.readline())
-            for i in range(n_orders):
-                x, y = map(int, file.readline().split(" "))
-                n_products_in_order = int(file.readline())
-                order_products = list(map(int, file.readline().split(" ")))  # applies int() to each element
-                # to ensure the number of products in order actually corresponds to the number of products listed
-                assert n_products_in_order == len(order_products)
-                # order_products = [products[x] for x in order_products]      # list[int] -> list[Product]
-                order = Order(i, Point(x, y), dict(Counter(order_products)))
-                order_list.append(order)
-
-        return n_rows, n_cols, n_drones, max_turns, max_payload, warehouses, order_list, products
+            return Problem.parse_content(file.read())
+
+    @staticmethod
+    def parse_content(content: str) -> dict[str, np.ndarray]:
+        """
+        Parsing of the contents of a .in file into integer arrays, the whole file is converted in a single pass
+
+        :param content: contents of the .in file
+        :return: dictionary with the header (rows, columns, drones, turns and payload), the weights of the products,
+        the positions and stock of the warehouses, the positions of the orders, and the products and quantities of
+        the orders (order i holds order_products[order_offsets[i]:order_offsets[i + 1]], in order of appearance)
+        """
+        tokens = np.fromstring(content, dtype=np.int64, sep=' ')  # any whitespace separates the values
+
+        header, n_products = tokens[:5], int(tokens[5])
+        weights = tokens[6:6 + n_products]
+        position = 6 + n_products
+
+        # every warehouse takes 2 + n_products values: position and stock
+        n_warehouses = int(tokens[position])
+        warehouses = tokens[position + 1:position + 1 + n_warehouses * (2 + n_products)].reshape(n_warehouses, -1)
+        position += 1 + n_warehouses * (2 + n_products)
+
+        # every order takes 3 + n values: position, n and its n products
+        n_orders = int(tokens[position])
+        starts = np.empty(n_orders, dtype=np.int64)
+        position += 1
+        for i in range(n_orders):
+            starts[i] = position
+            position += 3 + int(tokens[position + 2])
+        # to ensure the file ends with the last order
+        assert position == len(tokens)
+
+        counts = tokens[starts + 2]
+        item_offsets = np.zeros(n_orders + 1, dtype=np.int64)
+        np.cumsum(counts, out=item_offsets[1:])
+        # position of each item on the file: start of its order + 3 + position inside the order
+        item_order = np.repeat(np.arange(n_orders), counts)
+        items = tokens[starts[item_order] + 3 + np.arange(item_offsets[-1]) - item_offsets[item_order]]
+
+        # repeated items of an order are grouped in a quantity, keeping the order of their first appearance
+        keys, first, quantities = np.unique(item_order * n_products + items, return_index=True, return_counts=True)
+        appearance = np.argsort(first, kind='stable')
+        keys, quantities = keys[appearance], quantities[appearance]
+        order_offsets = np.zeros(n_orders + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_products, minlength=n_orders), out=order_offsets[1:])
+
+        return {
+            'header': header,
+            'weights': weights,
+            'warehouse_positions': warehouses[:, :2],
+            'stock': warehouses[:, 2:],
+            'order_positions': np.stack((tokens[starts], tokens[starts + 1]), axis=1).reshape(n_orders, 2),
+            'order_offsets': order_offsets,
+            'order_products': keys % n_products,
+            'order_quantities': quantities,
+        }
+
+    @staticmethod
+    def build_objects(arrays: dict[str, np.ndarray]) -> tuple[list[Warehouse], list[Order], list[Product]]:
+        """
+        Creates the Warehouses, Orders and Products of the arrays parsed from a file (see parse_arrays)
+
+        :param arrays: parsed arrays
+        :return: the warehouses, orders and products
+        """
+        products = [Product(i, weight) for i, weight in enumerate(arrays['weights'].tolist())]
+
+        # the products of a warehouse are built from its stock when first needed
+        warehouses = [Warehouse(i, Point(x, y), stock=stock)
+                      for i, ((x, y), stock) in enumerate(zip(arrays['warehouse_positions'].tolist(), arrays['stock']))]
+
+        offsets = arrays['order_offsets'].tolist()
+        items = list(zip(arrays['order_products'].tolist(), arrays['order_quantities'].tolist()))
+        orders = [Order(i, Point(x, y), dict(items[offsets[i]:offsets[i + 1]]))
+                  for i, (x, y) in enumerate(arrays['order_positions'].tolist())]
+        return warehouses, orders, products
+
+
+class StockIndex:
+    def __init__(self, quantities: np.ndarray):
+        """
+        Stock left on each warehouse, indexed by warehouse id and product id. Reserving and releasing products is
+        O(1), and the warehouses with stock of a product are found in a single column (there are few warehouses)
+        :param quantities: quantity of each product (columns) on each warehouse (rows), such as Problem.stock
+        """
+        self.quantities = quantities.astype(np.int64)
+        self.stocked = (self.quantities > 0).sum(axis=1)  # number of products with stock on each warehouse
+
+    def quantity(self, warehouse_id: int, product_id: int) -> int:
+        """
+        Quantity of a product left on a warehouse
+        :param warehouse_id: identifier of the warehouse
+        :param product_id: identifier of the product
+        :return: quantity left
+        """
+        return int(self.quantities[warehouse_id, product_id])
+
+    def warehouses(self, product_id: int) -> np.ndarray:
+        """
+        Warehouses with stock of a product
+        :param product_id: identifier of the product
+        :return: identifiers of the warehouses, in ascending order
+        """
+        return np.flatnonzero(self.quantities[:, product_id] > 0)
+
+    def products(self, warehouse_id: int) -> np.ndarray:
+        """
+        Products with stock on a warehouse
+        :param warehouse_id: identifier of the warehouse
+        :return: identifiers of the products, in ascending order
+        """
+        return np.flatnonzero(self.quantities[warehouse_id] > 0)
+
+    def stocked_warehouses(self) -> np.ndarray:
+        """
+        Warehouses with stock of any product
+        :return: identifiers of the warehouses, in ascending order
+        """
+        return np.flatnonzero(self.stocked > 0)
+
+    def has_any_product(self, warehouse_id: int, products: dict) -> bool:
+        """
+        Checks if a Warehouse has any of the products in the dict
+        :param warehouse_id: identifier of the warehouse
+        :param products: list of products
+        :return: true if the warehouse has any of the products
+        """
+        return bool((self.quantities[warehouse_id, list(products)] > 0).any())
+
+    def reserve(self, warehouse_id: int, product_id: int, quantity: int) -> None:
+        """
+        Removes a quantity of a product from a warehouse
+        :param warehouse_id: identifier of the warehouse
+        :param product_id: identifier of the product
+        :param quantity: quantity to remove
+        """
+        before = self.quantities[warehouse_id, product_id]
+        after = before - quantity
+        self.quantities[warehouse_id, product_id] = after
+        self.stocked[warehouse_id] += int(after > 0) - int(before > 0)
+
+    def release(self, warehouse_id: int, product_id: int, quantity: int) -> None:
+        """
+        Returns a quantity of a product to a warehouse
+        :param warehouse_id: identifier of the warehouse
+        :param product_id: identifier of the product
+        :param quantity: quantity to return
+        """
+        self.reserve(warehouse_id, product_id, -quantity)
+
+    def reserve_products(self, warehouse_id: int, products: dict[int, int]) -> None:
+        """
+        Removes several products from a warehouse
+        :param warehouse_id: identifier of the warehouse
+        :param products: products and quantities to remove
+        """
+        for product_id, quantity in products.items():
+            self.reserve(warehouse_id, product_id, quantity)
+
+    def copy(self) -> StockIndex:
+        """
+        Copies the stock
+        :return: the copied StockIndex
+        """
+        return StockIndex(self.quantities)
 
 
 class Gene:
+    __slots__ = ('drone_id', 'demand', 'node', 'product', 'turn', 'penalty')
+
     def __init__(self, drone_id: Union[int, None], demand: int, node: Spot, product: Product, turn: int = None):
         """
         Gene Constructor. Part of the Solution
@@ -297,21 +584,268 @@ class Gene:
         return super().__hash__()
 
 
+class GeneTable:
+    NO_DRONE = -1  # drone of the genes with drone_id None
+
+    __slots__ = ('drone', 'demand', 'node', 'product', '__rows', '__layout')
+
+    def __init__(self, drone: np.ndarray = None, demand: np.ndarray = None, node: np.ndarray = None,
+                 product: np.ndarray = None):
+        """
+        Compact storage of a list of Genes, with one integer array per attribute. The arrays are never altered in
+        place, every change returns a new table, so unchanged arrays are shared between tables and chromosomes. The
+        only exception is the table of a RouteIndex, which owns it and alters it in place (see objects.routes). The
+        positions of the genes of each drone are indexed when first needed (see rows), and the changes carry the
+        index to the table they return, updating only the drones they alter
+        :param drone: identifiers of the drones (NO_DRONE for None)
+        :param demand: quantities of product
+        :param node: node indexes of the Warehouses or Orders (see Problem.get_node)
+        :param product: identifiers of the products
+        """
+        empty = np.empty(0, dtype=np.int32)
+        self.drone = empty if drone is None else drone
+        self.demand = empty if demand is None else demand
+        self.node = empty if node is None else node
+        self.product = empty if product is None else product
+        self.__rows = None        # positions of the genes of each drone, built when first needed
+        self.__layout = object()  # shared by the tables whose genes are on the same positions
+
+    @staticmethod
+    def from_genes(genes: list[Gene], problem: Problem) -> GeneTable:
+        """
+        Creates a table from a list of Genes
+        :param genes: list of Genes
+        :param problem: problem of the Genes
+        :return: the created table
+        """
+        columns = np.array([(GeneTable.NO_DRONE if gene.drone_id is None else gene.drone_id, gene.demand,
+                             problem.node_index(gene.node), gene.product.id) for gene in genes],
+                           dtype=np.int32).reshape(-1, 4)
+        return GeneTable(*(np.ascontiguousarray(column) for column in columns.T))
+
+    def __len__(self) -> int:
+        return len(self.drone)
+
+    def gene(self, index: int, problem: Problem) -> Gene:
+        """
+        Gene stored on a position of the table
+        :param index: position of the gene
+        :param problem: problem of the table
+        :return: a Gene object with the values of the table
+        """
+        drone = int(self.drone[index])
+        return Gene(None if drone == GeneTable.NO_DRONE else drone, int(self.demand[index]),
+                    problem.get_node(int(self.node[index])), problem.get_product(int(self.product[index])))
+
+    def to_genes(self, problem: Problem) -> list[Gene]:
+        """
+        Genes stored on the table
+        :param problem: problem of the table
+        :return: list of Gene objects, in the order of the table
+        """
+        return [self.gene(i, problem) for i in range(len(self))]
+
+    def __eq__(self, o: GeneTable) -> bool:
+        """
+        Checks if 2 tables hold the same genes
+        :param o: The other table to compare
+        :return: true if the tables are equal
+        """
+        return len(self) == len(o) and all(np.array_equal(a, b) for a, b in zip(self.columns(), o.columns()))
+
+    def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Arrays of the table
+        :return: drones, demands, nodes and products
+        """
+        return self.drone, self.demand, self.node, self.product
+
+    def rows(self) -> dict[int, np.ndarray]:
+        """
+        Positions of the genes of each drone, built on the first call and carried to the tables derived from this
+        one. The index is shared between tables, so it must not be altered
+        :return: dictionary with the sorted positions of the genes of each drone with genes, NO_DRONE included
+        """
+        if self.__rows is None:
+            order = np.argsort(self.drone, kind='stable')
+            drones = self.drone[order]
+            first = np.flatnonzero(np.r_[True, drones[1:] != drones[:-1]]) if len(order) else order
+            self.__rows = dict(zip(drones[first].tolist(), np.split(order, first[1:])))
+        return self.__rows
+
+    def layout(self) -> object:
+        """
+        Token shared by the tables whose genes are on the same positions, as the tables that only differ on the
+        drones or demands of some genes
+        :return: the token of the table
+        """
+        return self.__layout
+
+    def reindex(self, rows: dict[int, np.ndarray]) -> None:
+        """
+        Replaces the positions of some drones in the index, for the owner of a table that rewrote the genes of these
+        drones in place without moving the genes of the others (see RouteIndex)
+        :param rows: sorted positions of the genes of each altered drone
+        """
+        if self.__rows is not None:
+            self.__rows = GeneTable.__replace(self.__rows, rows)
+
+    def encode(self) -> np.ndarray:
+        """
+        Compact encoding of the table, cheap to send to another process
+        :return: 4 x n array with the drones, demands, nodes and products
+        """
+        return np.stack(self.columns()) if len(self) else np.empty((4, 0), dtype=np.int32)
+
+    @staticmethod
+    def decode(encoded: np.ndarray) -> GeneTable:
+        """
+        Creates a table from its encoding (see encode)
+        :param encoded: 4 x n array with the drones, demands, nodes and products
+        :return: the decoded table
+        """
+        return GeneTable(*(np.ascontiguousarray(column, dtype=np.int32) for column in encoded))
+
+    def take(self, indexes) -> GeneTable:
+        """
+        Selects some genes of the table
+        :param indexes: positions, mask or slice of the genes to select
+        :return: table with the selected genes
+        """
+        return GeneTable(*(column[indexes] for column in self.columns()))  # the index is built again if needed
+
+    def concatenate(self, other: GeneTable) -> GeneTable:
+        """
+        Appends the genes of another table
+        :param other: table to append
+        :return: table with the genes of both tables
+        """
+        table = GeneTable(*(np.concatenate((a, b)) for a, b in zip(self.columns(), other.columns())))
+        if self.__rows is not None:
+            table.__rows = dict(self.__rows)
+            for drone, rows in other.rows().items():
+                rows = rows + len(self)
+                table.__rows[drone] = np.concatenate((self.__rows[drone], rows)) if drone in self.__rows else rows
+        return table
+
+    def insert(self, index: int, drone: int, demand: int, node: int, product: int) -> GeneTable:
+        """
+        Inserts a gene in the table
+        :param index: position of the new gene
+        :param drone: drone of the new gene
+        :param demand: demand of the new gene
+        :param node: node index of the new gene
+        :param product: product of the new gene
+        :return: table with the new gene
+        """
+        table = GeneTable(*(np.insert(column, index, value)
+                            for column, value in zip(self.columns(), (drone, demand, node, product))))
+        if self.__rows is not None:  # the genes after the new one move to the next position
+            rows = {key: positions + (positions >= index) for key, positions in self.__rows.items()}
+            table.__rows = GeneTable.__replace(rows, {int(drone): np.union1d(rows.get(int(drone), index), index)})
+        return table
+
+    def delete(self, indexes) -> GeneTable:
+        """
+        Removes genes from the table
+        :param indexes: positions of the genes to remove
+        :return: table without the removed genes
+        """
+        removed = self.__positions(indexes)
+        table = GeneTable(*(np.delete(column, removed) for column in self.columns()))
+        if self.__rows is not None:  # the genes after a removed one move back a position
+            kept = {key: np.setdiff1d(positions, removed, assume_unique=True) for key, positions in self.__rows.items()}
+            table.__rows = {key: positions - np.searchsorted(removed, positions)
+                            for key, positions in kept.items() if len(positions)}
+        return table
+
+    def set_drones(self, indexes, drones) -> GeneTable:
+        """
+        Changes the drones of some genes, only the array of drones is copied. The genes keep their positions, so
+        only the positions of their old and new drones are indexed again
+        :param indexes: positions or slice of the genes
+        :param drones: new drones
+        :return: table with the new drones
+        """
+        drone = self.drone.copy()
+        drone[indexes] = drones
+        table = GeneTable(drone, self.demand, self.node, self.product)
+        table.__layout = self.__layout
+        if self.__rows is not None:
+            changed = self.__positions(indexes)
+            rows = {}
+            for key in set(self.drone[changed].tolist()) | set(drone[changed].tolist()):
+                kept = np.setdiff1d(self.__rows.get(key, changed[:0]), changed, assume_unique=True)
+                rows[key] = np.union1d(kept, changed[drone[changed] == key])
+            table.__rows = GeneTable.__replace(self.__rows, rows)
+        return table
+
+    def set_demands(self, indexes, demands) -> GeneTable:
+        """
+        Changes the demands of some genes, only the array of demands is copied
+        :param indexes: positions of the genes
+        :param demands: new demands
+        :return: table with the new demands
+        """
+        demand = self.demand.copy()
+        demand[indexes] = demands
+        table = GeneTable(self.drone, demand, self.node, self.product)
+        table.__rows, table.__layout = self.__rows, self.__layout
+        return table
+
+    def __positions(self, indexes) -> np.ndarray:
+        """
+        Sorted positions of some genes
+        :param indexes: positions or slice of the genes
+        :return: array with the positions, without repetitions
+        """
+        if isinstance(indexes, slice):
+            return np.arange(*indexes.indices(len(self)))
+        return np.unique(np.asarray(indexes, dtype=np.int64))
+
+    @staticmethod
+    def __replace(rows: dict[int, np.ndarray], changed: dict[int, np.ndarray]) -> dict[int, np.ndarray]:
+        """
+        Index with the positions of some drones replaced, the drones left without genes are dropped
+        :param rows: index of the table (see rows)
+        :param changed: new positions of the genes of some drones
+        :return: the new index, rows is left untouched
+        """
+        rows = dict(rows)
+        for key, positions in changed.items():
+            if len(positions):
+                rows[key] = positions
+            else:
+                rows.pop(key, None)
+        return rows
+
+
 class DronePath:
-    def __init__(self, drone_id: int, current_position: Point = Point(0, 0), steps: list[Gene] = None):
+    def __init__(self, problem: Problem, drone_id: int, current_position: Point = None, genes: GeneTable = None,
+                 current_node: int = 0):
         """
         Drone Path constructor
+        :param problem: problem solved by the Drone
         :param drone_id: Drone identifier
-        :param current_position: Current position of the Drone. Defaults to Point(0, 0).
-        :param steps: list of Genes of that Drone. Defaults to None.
-        """
-        if steps is None:
-            steps = []
+        :param current_position: Current position of the Drone. Defaults to the first warehouse.
+        :param genes: table with the Genes of that Drone. Defaults to None.
+        :param current_node: node index of the current position. Defaults to the first warehouse.
+        """
+        if genes is None:
+            genes = GeneTable()
+        if current_position is None:
+            current_position = problem.warehouses[0].position
+        self.problem = problem
         self.drone_id = drone_id
-        self.steps = steps
+        self.genes = genes
+        self.step_turns = np.zeros(len(genes), dtype=np.int32)      # turn of each gene
+        self.step_penalties = np.zeros(len(genes), dtype=np.int32)  # penalty of each gene
+        self.order_turns: dict[int, int] = {}   # turn of the last delivery to each order
         self.shipments = []
         self.current_position = current_position
+        self.current_node = current_node
         self.turns = 0
+        self.penalty = 0
 
     def __str__(self) -> str:
         """
@@ -322,6 +856,17 @@ class DronePath:
         [print(str(gene)) for gene in self.steps]
         return ""
 
+    @property
+    def steps(self) -> list[Gene]:
+        """
+        Genes of this Drone, in the order they are executed
+        :return: list of Genes, with their turns and penalties
+        """
+        steps = self.genes.to_genes(self.problem)
+        for gene, turn, penalty in zip(steps, self.step_turns.tolist(), self.step_penalties.tolist()):
+            gene.turn, gene.penalty = turn, penalty
+        return steps
+
     def get_last_step(self) -> Union[Gene, None]:
         """
         Gets last step of the gene list
@@ -332,20 +877,14 @@ class DronePath:
         except IndexError:  # if steps = []
             return None
 
-    def add_step(self, gene: Gene) -> None:
-        """
-        Adds a gene to the list of genes
-        :param gene: Gene to append
-        :return:
-        """
-        self.steps.append(gene)
-
-    def set_position(self, position: Point) -> None:
+    def set_position(self, position: Point, node: int) -> None:
         """
         Sets the current position of the drone
         :param position: Position
+        :param node: node index of the position
         """
         self.current_position = position
+        self.current_node = node
 
     def add_shipment(self, shipment: Shipment) -> None:
         """
@@ -363,17 +902,14 @@ class DronePath:
 
 
 class OrderPath:
-    def __init__(self, order: Order, steps: list[Gene] = None, score: int = 0):
+    def __init__(self, order: Order, score: int = 0):
         """
         Path of the Order
         :param order: Order object associated to this path
-        :param steps: List of Genes of this Order
         :param score: Score of this order
         """
-        if steps is None:
-            steps = []
         self.order = order
-        self.steps = steps
+        self.drone_paths: dict[int, DronePath] = {}  # paths of the drones that deliver to this order
         self.score = score  # calculated score for this order
 
     def __str__(self) -> str:
@@ -385,49 +921,94 @@ class OrderPath:
         [print(str(gene)) for gene in self.steps]
         return ""
 
-    def add_step(self, gene: Gene) -> None:
+    @property
+    def steps(self) -> list[Gene]:
         """
-        Appends a Gene to the list of steps
-        :param gene: gene to append
-        :return: None
+        Every Gene of this Order, regardless of the drone
+        :return: list of Genes
+        """
+        return [gene for drone_path in self.drone_paths.values() for gene in drone_path.steps
+                if gene.node is self.order]
+
+    def add_path(self, drone_path: DronePath) -> None:
+        """
+        Adds the path of a drone that delivers to this order
+        :param drone_path: DronePath to add
+        """
+        self.drone_paths[drone_path.drone_id] = drone_path
+
+    def remove_drone(self, drone_id: int) -> None:
         """
-        self.steps.append(gene)
+        Removes the path of a drone
+        :param drone_id: identifier of the drone
+        """
+        self.drone_paths.pop(drone_id, None)
 
-    def update_score(self) -> int:
+    def copy(self) -> OrderPath:
+        """
+        Copies the OrderPath, the DronePaths are shared
+        :return: the copied OrderPath
+        """
+        order_path = OrderPath(self.order, self.score)
+        order_path.drone_paths = dict(self.drone_paths)
+        return order_path
+
+    def empty(self) -> bool:
+        """
+        Checks if there are no steps left for this Order
+        :return: true if no drone delivers to this Order
+        """
+        return not self.drone_paths
+
+    def update_score(self, problem: Problem) -> int:
         """
         Updates the Drone Path score
+        :param problem: problem of the Order
         :return: Updated Score
         """
-        maximum = max(gene.turn for gene in self.steps)
-        self.score = Problem.calculate_points(maximum)
+        maximum = max(drone_path.order_turns[self.order.id] for drone_path in self.drone_paths.values())
+        self.score = problem.calculate_points(maximum)
         return self.score
 
 
 class Chromosome:
-    def __init__(self, genes: list[Gene] = None, solution: dict[int, DronePath] = None,
-                 orders: dict[int, OrderPath] = None, score: int = 0):
+    def __init__(self, problem: Problem, genes: Union[list[Gene], GeneTable] = None,
+                 solution: dict[int, DronePath] = None, orders: dict[int, OrderPath] = None, score: int = 0):
         """
         The representation of the solution
-        :param genes: List of genes
+        :param problem: problem solved, shared by every copy of the chromosome
+        :param genes: List or table of genes
         :param solution: dictionary of DronePaths for each Drone
         :param orders: dictionary of OrderPaths for each Order
         :param score: Score of the solution
         """
         if orders is None: orders = {}
-        if genes is None: genes = []
+        if genes is None: genes = GeneTable()
         if solution is None: solution = {}
-        self.genes = genes
+        self.problem = problem
+        self.__genes = genes if isinstance(genes, GeneTable) else GeneTable.from_genes(genes, problem)
+        self.__pending: list[Gene] = []  # genes added since the table was last built
         self.solution = solution
         self.orders = orders
         self.score = score
         self.penalty = 0
+        self.__cumulative = 0    # sum of the scores of every OrderPath
+        self.__dirty = None      # drones to rebuild on the next update, None forces a full rebuild
+        self.__owned = set()     # OrderPaths created by this chromosome, the others may be shared with a copy
+        self.__stock = None      # stock left after the loads of the genes, built when first needed
+        self.__stock_owned = False
+        self.__gathered = None   # layout, index, turns and penalties of the genes when they were last gathered
+        self.__regather = set()  # drones rebuilt since then
 
     def __str__(self) -> str:
         """
         String representation of the chromosome
         :return: Representation of each Gene
         """
-        return "\n".join([str(gene) for gene in self.genes])
+        genes = self.genes.to_genes(self.problem)
+        for gene, turn, penalty in zip(genes, self.turns().tolist(), self.penalties().tolist()):
+            gene.turn, gene.penalty = None if turn < 0 else turn, penalty
+        return "\n".join([str(gene) for gene in genes])
 
     def __repr__(self) -> str:
         """
@@ -438,13 +1019,98 @@ class Chromosome:
                                                                                           penalty=self.penalty,
                                                                                           score=self.score)
 
+    @property
+    def genes(self) -> GeneTable:
+        """
+        Table with the genes of the chromosome
+        :return: GeneTable
+        """
+        if self.__pending:
+            self.__genes = self.__genes.concatenate(GeneTable.from_genes(self.__pending, self.problem))
+            self.__pending = []
+        return self.__genes
+
+    @genes.setter
+    def genes(self, genes: GeneTable) -> None:
+        """
+        Replaces every gene of the chromosome, forcing a full rebuild on the next update
+        :param genes: the new table of genes
+        """
+        self.__genes, self.__pending = genes, []
+        self.__dirty = None
+        self.__stock = None
+
+    def set_genes(self, genes: GeneTable, touched) -> None:
+        """
+        Replaces the table of genes, only the paths of the touched drones will be rebuilt on the next update
+        :param genes: the new table of genes
+        :param touched: identifiers of the drones whose genes were altered
+        """
+        self.__genes, self.__pending = genes, []
+        self.touch(touched)
+
     def add_gene(self, gene: Gene) -> None:
         """
         Appends a Gene to the gene list
         :param gene: Gene to be appended
         :return: None
         """
-        self.genes.append(gene)
+        self.__pending.append(gene)
+        self.touch([gene.drone_id])
+        if self.__stock is not None and gene.demand > 0 and isinstance(gene.node, Warehouse):
+            if not self.__stock_owned:
+                self.__stock, self.__stock_owned = self.__stock.copy(), True
+            self.__stock.reserve(gene.node.id, gene.product.id, gene.demand)
+
+    def touch(self, drones) -> None:
+        """
+        Marks the paths of some drones as outdated, they will be rebuilt on the next update
+        :param drones: identifiers of the altered drones (None's are ignored)
+        """
+        if self.__dirty is not None:
+            self.__dirty.update(drone for drone in drones if drone is not None and drone != GeneTable.NO_DRONE)
+
+    def stock(self) -> StockIndex:
+        """
+        Stock left on the warehouses after every load of the genes (with or without drone). It may be shared with
+        copies of this chromosome, so it must only be altered through reserve and release
+        :return: StockIndex of the chromosome
+        """
+        if self.__stock is None:
+            genes = self.genes
+            loads = (genes.demand > 0) & (genes.node < len(self.problem.warehouses))
+            quantities = self.problem.stock.astype(np.int64)
+            np.subtract.at(quantities, (genes.node[loads], genes.product[loads]), genes.demand[loads])
+            self.__stock, self.__stock_owned = StockIndex(quantities), True
+        return self.__stock
+
+    def reserve(self, genes: GeneTable) -> None:
+        """
+        Removes the loads of some genes from the stock, to be called when they are added to the chromosome
+        :param genes: added genes
+        """
+        self.__update_stock(genes, 1)
+
+    def release(self, genes: GeneTable) -> None:
+        """
+        Returns the loads of some genes to the stock, to be called when they are removed from the chromosome
+        :param genes: removed genes
+        """
+        self.__update_stock(genes, -1)
+
+    def turns(self) -> np.ndarray:
+        """
+        Turn of each gene, updating the chromosome first if needed
+        :return: read-only array aligned with the genes, -1 for the genes without drone
+        """
+        return self.__gather()[0]
+
+    def penalties(self) -> np.ndarray:
+        """
+        Penalty of each gene, updating the chromosome first if needed
+        :return: read-only array aligned with the genes, 0 for the genes without drone
+        """
+        return self.__gather()[1]
 
     def print_solution(self) -> None:
         """
@@ -462,116 +1128,241 @@ class Chromosome:
 
     def update_internal(self) -> float:
         """
-        Updates Solution, orders and value of this chromosome
+        Updates Solution, orders and value of this chromosome. Only the paths of the drones touched since the
+        last update are rebuilt, along with the orders they deliver to
         :return: The score with the penalties subtracted
         """
-        self.penalty = 0
-        self.solution = {}
-        self.orders = {}
-
-        for gene in self.genes:
-            gene.turn = None
-            gene.penalty = 0
-            self.__update_solution(gene)
-            self.__update_orders(gene)
-
-        self.__update_penalties()
+        if profiling.active is not None:
+            with profiling.active.timer('evaluation'):
+                return self.__update_internal()
+        return self.__update_internal()
 
-        cumulative = 0
-        for order_path in self.orders.values():
-            cumulative += order_path.update_score()
-        self.score = float(cumulative) / len(Problem.orders)
+    def __update_internal(self) -> float:
+        """
+        Updates the chromosome (see update_internal)
+        :return: The score with the penalties subtracted
+        """
+        genes = self.genes
+        rows = genes.rows()
+        if self.__dirty is None:
+            self.penalty = 0
+            self.__cumulative = 0
+            self.solution = {}
+            self.orders = {}
+            self.__gathered = None
+            dirty = set(rows)
+            dirty.discard(GeneTable.NO_DRONE)
+        else:
+            dirty = self.__dirty
+            if self.__gathered is not None:
+                self.__regather.update(dirty)
+        self.__dirty = set()
+        self.__owned = set()
+        if profiling.active is not None:
+            profiling.active.count('evaluation.paths', len(dirty))
+
+        if dirty:
+            affected = set()
+            for drone_id in dirty:
+                old_turns, new_turns = self.__remove_path(drone_id), {}
+                if drone_id in rows:
+                    drone_path = DronePath(self.problem, drone_id, genes=genes.take(rows[drone_id]))
+                    self.__update_solution(drone_path)
+                    self.__update_orders(drone_path)
+                    self.__update_penalties(drone_path)
+                    new_turns = drone_path.order_turns
+                for order_id in old_turns.keys() - new_turns.keys():
+                    self.__own_order(order_id).remove_drone(drone_id)
+                # an order is only scored again if the turn of the last delivery of this drone to it changed
+                affected.update(order_id for order_id in old_turns.keys() | new_turns.keys()
+                                if old_turns.get(order_id) != new_turns.get(order_id))
+            for order_id in affected:
+                self.__update_score(order_id)
+
+        self.score = float(self.__cumulative) / len(self.problem.orders)
 
         return self.score - self.penalty
 
-    def mutate(self) -> Chromosome:
+    def mutate(self, rng: np.random.Generator) -> Chromosome:
         """
         Applies a mutation to the current chromosome
+        :param rng: random generator choosing the mutation and used by it
         :return: the new mutated chromosome
         """
-        mutated_chromosome = deepcopy(self)
+        mutated_chromosome = self.copy()
 
         mutation_functions = [unbalance_quantities, join_genes, pop_gene, cleanse_genes, switch_drones, add_gene]
 
-        mutated_chromosome.genes = mutation_functions[random.randint(0, len(mutation_functions))](
-            mutated_chromosome.genes)
+        touched = set()
+        mutation_function = mutation_functions[rng.integers(0, len(mutation_functions))]
+        if profiling.active is None:
+            genes = mutation_function(mutated_chromosome, touched, rng)
+        else:
+            with profiling.active.timer('mutation.' + mutation_function.__name__):
+                genes = mutation_function(mutated_chromosome, touched, rng)
+        mutated_chromosome.set_genes(genes, touched)
 
         return mutated_chromosome
 
+    def copy(self) -> Chromosome:
+        """
+        Copy-on-write copy of the chromosome. The gene table, DronePaths and OrderPaths are shared with this
+        chromosome and only replaced in the copy when they are altered, the problem objects are never copied
+        :return: the copied chromosome
+        """
+        if profiling.active is not None:
+            profiling.active.count('copy')
+        chromosome = Chromosome(self.problem, self.genes, dict(self.solution), dict(self.orders), self.score)
+        chromosome.penalty = self.penalty
+        chromosome.__cumulative = self.__cumulative
+        chromosome.__dirty = None if self.__dirty is None else set(self.__dirty)
+        chromosome.__stock = self.__stock
+        self.__stock_owned = False
+        chromosome.__gathered, chromosome.__regather = self.__gathered, set(self.__regather)
+        return chromosome
+
     def clean(self) -> Chromosome:
         """
         Removes the genes with drone_id None from the chromosome
         :return: the cleaned chromosome
         """
-        self.genes = list(filter(lambda x: x.drone_id is not None, self.genes))
+        genes = self.genes
+        unassigned = genes.rows().get(GeneTable.NO_DRONE, [])
+        self.release(genes.take(unassigned))
+        self.set_genes(genes.delete(unassigned), [])
         return self
 
-    def __update_solution(self, gene: Gene) -> None:
+    def __update_solution(self, drone_path: DronePath) -> None:
         """
-        Updates the internal values of the chromosome DronePaths
-        :param gene: Gene to be evaluated
+        Updates the turns of a DronePath and adds it to the solution
+        :param drone_path: DronePath to be evaluated
         """
-        if gene.drone_id is None:
-            return
+        nodes = drone_path.genes.node
+        previous = np.empty_like(nodes)
+        previous[0] = drone_path.current_node
+        previous[1:] = nodes[:-1]
+        drone_path.step_turns = np.cumsum(self.problem.distances()[previous, nodes] + 1, dtype=np.int32)
 
-        if not self.__path_exists(gene.drone_id):
-            self.__add_path(gene.drone_id)
+        # the turns only grow along the path, so the last delivery to each order is the one kept
+        n_warehouses = len(self.problem.warehouses)
+        deliveries = nodes >= n_warehouses
+        drone_path.order_turns = dict(zip((nodes[deliveries] - n_warehouses).tolist(),
+                                          drone_path.step_turns[deliveries].tolist()))
 
-        path = self.__get_path(gene.drone_id)
-        last_step = path.get_last_step()
-        if last_step is None:
-            previous_position = Problem.warehouses[0].position
-            previous_turns = 0
-        else:
-            previous_position = last_step.node.position
-            previous_turns = last_step.turn
+        drone_path.turns = int(drone_path.step_turns[-1])
+        self.solution[drone_path.drone_id] = drone_path
 
-        gene.set_turns(previous_turns +
-                       gene.node.position.distance(previous_position) +
-                       1)
-        path.add_step(gene)
+    def __update_orders(self, drone_path: DronePath) -> None:
+        """
+        Adds a DronePath to the OrderPaths of the orders it delivers to
+        :param drone_path: DronePath to be added
+        """
+        for order_id in drone_path.order_turns:
+            if not self.__order_exists(order_id):
+                self.__add_order(self.problem.orders[order_id])
+            self.__own_order(order_id).add_path(drone_path)
 
-    def __update_orders(self, gene: Gene) -> None:
+    def __update_penalties(self, drone_path: DronePath) -> None:
         """
-        Updates the internal values of the chromosome OrderPaths
-        :param gene: Gene to be evaluated
+        Updates the penalties of a DronePath
+        :param drone_path: DronePath to be evaluated
         """
-        if gene.drone_id is None:
-            return
-        if isinstance(gene.node, Order):
-            if not self.__order_exists(gene.node):
-                self.__add_order(gene.node)
+        if profiling.active is None:
+            drone_path.penalty = check_drone_path(drone_path, self.problem.weights, self.problem.payload,
+                                                  self.problem.turns)
+        else:
+            with profiling.active.timer('constraints'):
+                drone_path.penalty = check_drone_path(drone_path, self.problem.weights, self.problem.payload,
+                                                      self.problem.turns)
+        self.penalty += drone_path.penalty
 
-            order_path = self.__get_order(gene.node)
-            order_path.add_step(gene)
-        pass
+    def __update_score(self, order_id: int) -> None:
+        """
+        Updates the score of an OrderPath, removing it if no drone delivers to the order anymore
+        :param order_id: identifier of the order
+        """
+        order_path = self.orders[order_id]
+        self.__cumulative -= order_path.score
+        if order_path.empty():
+            self.orders.pop(order_id)
+        else:
+            self.__cumulative += order_path.update_score(self.problem)
 
-    def __update_penalties(self) -> None:
+    def __remove_path(self, drone_id: int) -> dict[int, int]:
         """
-        Updates the penalties of each DronePath
+        Removes a DronePath from the solution and its contribution to the penalty. The OrderPaths keep it until the
+        rebuilt path replaces it, or the drone is removed from the orders it no longer delivers to
+        :param drone_id: identifier of the drone
+        :return: turn of the last delivery of the drone to each order
         """
-        for drone_path in self.solution.values():
-            self.penalty += check_payload(drone_path, Problem.products, Problem.payload)
-            self.penalty += check_delivery(drone_path)
-            self.penalty += check_turns(drone_path, Problem.turns)
+        drone_path = self.solution.pop(drone_id, None)
+        if drone_path is None:
+            return {}
 
-    def __path_exists(self, drone_id: int) -> bool:
-        return True if drone_id in self.solution else False
+        self.penalty -= drone_path.penalty
+        return drone_path.order_turns
 
-    def __add_path(self, drone_id: int) -> None:
-        self.solution[drone_id] = DronePath(drone_id)
+    def __own_order(self, order_id: int) -> OrderPath:
+        """
+        Gets an OrderPath that can be altered, copying it first if it may be shared with other chromosomes
+        :param order_id: identifier of the order
+        :return: the OrderPath owned by this chromosome
+        """
+        if order_id not in self.__owned:
+            self.orders[order_id] = self.orders[order_id].copy()
+            self.__owned.add(order_id)
+        return self.orders[order_id]
 
-    def __get_path(self, drone_id: int) -> DronePath:
-        return self.solution.get(drone_id)
+    def __update_stock(self, genes: GeneTable, sign: int) -> None:
+        """
+        Reserves (sign 1) or releases (sign -1) the loads of some genes, copying the stock first if it is shared
+        :param genes: genes whose loads are reserved or released
+        :param sign: 1 to reserve, -1 to release
+        """
+        if self.__stock is None:  # it will be built from the genes when needed
+            return
+        if not self.__stock_owned:
+            self.__stock, self.__stock_owned = self.__stock.copy(), True
+
+        loads = (genes.demand > 0) & (genes.node < len(self.problem.warehouses))
+        for node, product, demand in zip(genes.node[loads].tolist(), genes.product[loads].tolist(),
+                                         genes.demand[loads].tolist()):
+            self.__stock.reserve(node, product, sign * demand)
+
+    def __gather(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Gathers the turns and penalties of every DronePath into arrays aligned with the genes. While the genes keep
+        their positions, only the positions of the drones rebuilt since the last gathering are written again
+        :return: read-only turns and penalties of the genes, -1 and 0 for the genes without drone
+        """
+        if self.__dirty is None or self.__dirty:
+            self.update_internal()
+
+        genes = self.genes
+        rows = genes.rows()
+        if self.__gathered is not None and self.__gathered[0] is genes.layout():
+            _, previous, turns, penalties = self.__gathered
+            turns, penalties = turns.copy(), penalties.copy()  # the gathered arrays may be shared with copies
+            drones = self.__regather
+            for drone_id in drones & previous.keys():
+                turns[previous[drone_id]], penalties[previous[drone_id]] = -1, 0
+        else:
+            turns, penalties = np.full(len(genes), -1, dtype=np.int32), np.zeros(len(genes), dtype=np.int32)
+            drones = self.solution.keys()
+        for drone_id in drones & self.solution.keys():
+            drone_path = self.solution[drone_id]
+            turns[rows[drone_id]], penalties[rows[drone_id]] = drone_path.step_turns, drone_path.step_penalties
+
+        turns.flags.writeable = penalties.flags.writeable = False
+        self.__gathered, self.__regather = (genes.layout(), rows, turns, penalties), set()
+        return turns, penalties
 
-    def __order_exists(self, order: Order) -> bool:
-        return True if order.id in self.orders else False
+    def __order_exists(self, order_id: int) -> bool:
+        return True if order_id in self.orders else False
 
     def __add_order(self, order: Order) -> None:
         self.orders[order.id] = OrderPath(order)
-
-    def __get_order(self, order: Order) -> OrderPath:
-        return self.orders[order.id]
+        self.__owned.add(order.id)
 
     def __eq__(self, o: Chromosome) -> bool:
         """
@@ -579,23 +1370,25 @@ class Chromosome:
         :param o: The other Chromossome to be evaluated
         :return: true if the chromossomes are the same
         """
-        if len(self.genes) != len(o.genes): return False
-        for i in range(0, len(self.genes)):
-            if self.genes[i] != o.genes[i]: return False
-        return True
+        return self.genes == o.genes
 
 
 class Shipment:
-    def __init__(self, drone_path: DronePath, order: Order, warehouse: Warehouse):
+    def __init__(self, problem: Problem, drone_path: DronePath, order: Order, warehouse: Warehouse,
+                 stock: StockIndex):
         """
         Shipment representing a trip to a warehouse and a trip to the order Point
+        :param problem: problem solved
         :param drone_path: DronePath to associate the Shipment to a Drone
         :param order: Order that will received products
         :param warehouse: WareHouse from where the products will be taken
+        :param stock: Stock left on the warehouses
         """
+        self.problem = problem
         self.drone_path = drone_path
         self.order = order
         self.warehouse = warehouse
+        self.stock = stock
         self.products: dict[int, int] = {}
         self.product_weight = 0
         self.turns = 0
@@ -612,18 +1405,18 @@ class Shipment:
         """
         prods: list[tuple[int, int]] = []
         for product_id, quantity in self.order.products.items():
-            available = min(quantity, self.warehouse.products.get(product_id, 0))
+            available = min(quantity, self.stock.quantity(self.warehouse.id, product_id))
             if available > 0:
                 prods.append((product_id, available))
 
-        prods = sorted(prods, key=lambda p: -Problem.get_product(p[0]).weight)
-        drone_payload = Problem.payload
+        prods = sorted(prods, key=lambda p: -self.problem.get_product(p[0]).weight)
+        drone_payload = self.problem.payload
         carrying: dict[int, int] = {}
 
         for product_id, quantity in prods:
             while quantity > 0:
-                if Problem.get_product(product_id).weight <= drone_payload:
-                    drone_payload -= Problem.get_product(product_id).weight
+                if self.problem.get_product(product_id).weight <= drone_payload:
+                    drone_payload -= self.problem.get_product(product_id).weight
                     if product_id in carrying.keys():
                         carrying[product_id] += 1
                     else:
@@ -633,7 +1426,7 @@ class Shipment:
                     break
 
         self.products = carrying
-        self.product_weight = sum(Problem.get_product(p).weight * q for p, q in self.products.items())
+        self.product_weight = sum(self.problem.get_product(p).weight * q for p, q in self.products.items())
         self.accomplishment = self.product_weight / self.order.product_weight
 
         self.calculate_score()
@@ -642,8 +1435,10 @@ class Shipment:
         """
         Calculates the Shipment Score
         """
-        self.wh_distance = self.drone_path.current_position.distance(self.warehouse.position)
-        self.ord_distance = self.warehouse.position.distance(self.order.position)
+        distances = self.problem.distances()
+        warehouse_node = self.problem.node_index(self.warehouse)
+        self.wh_distance = int(distances[self.drone_path.current_node, warehouse_node])
+        self.ord_distance = int(distances[warehouse_node, self.problem.node_index(self.order)])
         self.turns = self.wh_distance + self.ord_distance + len(self.products) * 2
         self.score = self.accomplishment / self.turns
 
@@ -660,15 +1455,15 @@ class Shipment:
         :param chromosome: Chromossome to add Genes to
         :return: Number of orders completed
         """
-        self.warehouse.remove_products(self.products)
+        self.stock.reserve_products(self.warehouse.id, self.products)
         self.order.remove_products(self.products)
-        self.drone_path.set_position(self.order.position)
+        self.drone_path.set_position(self.order.position, self.problem.node_index(self.order))
         self.drone_path.add_shipment(self)
 
         # update chromosome load genes
         for product_id, quantity in self.products.items():
             chromosome.add_gene(
-                Gene(self.drone_path.drone_id, quantity, self.warehouse, Problem.get_product(product_id),
+                Gene(self.drone_path.drone_id, quantity, self.warehouse, self.problem.get_product(product_id),
                      self.drone_path.turns + 1))
 
         self.drone_path.add_turns(self.turns)
@@ -676,7 +1471,7 @@ class Shipment:
         # update chromosome unload genes
         for product_id, quantity in self.products.items():
             chromosome.add_gene(
-                Gene(self.drone_path.drone_id, -quantity, self.order, Problem.get_product(product_id),
+                Gene(self.drone_path.drone_id, -quantity, self.order, self.problem.get_product(product_id),
                      self.drone_path.turns))
 
         return int(self.order.complete())
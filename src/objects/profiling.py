@@ -0,0 +1,110 @@
+from __future__ import annotations
+import contextlib
+from time import perf_counter
+
+# profiler collecting the measures of this process, None while profiling is disabled. The instrumented code only
+# checks it before measuring anything, so a disabled profiler costs a global lookup per call
+active: Profiler = None
+
+
+class Profiler:
+    def __init__(self):
+        """
+        Counters and timers of a run, each one identified by a name such as "mutation.pop_gene". Only the work of
+        this process is measured, the processes of the parallel algorithms have their own (disabled) profiler
+        """
+        self.counters: dict[str, int] = {}
+        self.timers: dict[str, list] = {}          # calls, total seconds and slowest call of each timer
+        self.series: dict[str, list[float]] = {}   # seconds of each call of the timers whose calls are kept
+        self.start = perf_counter()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Increments a counter
+        :param name: name of the counter
+        :param amount: amount added to the counter
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float, keep: bool = False) -> None:
+        """
+        Adds a call to a timer
+        :param name: name of the timer
+        :param seconds: duration of the call
+        :param keep: flag to also keep the duration of this call (see series)
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+        if keep:
+            self.series.setdefault(name, []).append(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, keep: bool = False):
+        """
+        Times the block of a with statement (see add_time)
+        :param name: name of the timer
+        :param keep: flag to also keep the duration of this call
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - start, keep)
+
+    def metrics(self) -> dict:
+        """
+        Measures collected so far, made of plain values so they can be saved as JSON
+        :return: dictionary with the elapsed seconds, the counters, the calls, total, mean and max seconds of each
+        timer, the durations kept of each call (series) and the acceptance rate of each search (see accepted)
+        """
+        acceptance = {}
+        for name, accepted in self.counters.items():
+            if name.endswith('.accepted'):
+                search = name[:-len('.accepted')]
+                total = accepted + self.counters.get(search + '.rejected', 0)
+                acceptance[search] = accepted / total if total else 0.0
+        return {
+            'elapsed': perf_counter() - self.start,
+            'counters': dict(sorted(self.counters.items())),
+            'timers': {name: {'calls': calls, 'total': total, 'mean': total / calls, 'max': slowest}
+                       for name, (calls, total, slowest) in sorted(self.timers.items())},
+            'series': {name: list(values) for name, values in sorted(self.series.items())},
+            'acceptance': acceptance,
+        }
+
+
+@contextlib.contextmanager
+def profile(profiler: Profiler = None):
+    """
+    Enables profiling in this process for the block of a with statement, restoring the previous profiler afterwards
+
+        with profile() as profiler:
+            hill_climbing(solution, 100, plot=False)
+        print(profiler.metrics())
+
+    :param profiler: profiler collecting the measures, defaults to a new one
+    :return: the profiler, as the target of the with statement
+    """
+    global active
+    previous, active = active, profiler if profiler is not None else Profiler()
+    try:
+        yield active
+    finally:
+        active = previous
+
+
+def accepted(search: str, accept: bool) -> None:
+    """
+    Counts a candidate accepted or rejected by a search (counters "<search>.accepted" and "<search>.rejected"), if
+    profiling is enabled
+    :param search: name of the search
+    :param accept: flag of the acceptance of the candidate
+    """
+    if active is not None:
+        active.count(search + ('.accepted' if accept else '.rejected'))
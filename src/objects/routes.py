@@ -0,0 +1,308 @@
+import numpy as np
+import objects.primitives as prim
+
+# node every drone starts its path on, the first warehouse (see DronePath)
+START_NODE = 0
+
+
+class _RouteTable(prim.GeneTable):
+    """
+    Table of genes owned by a RouteIndex, the only tables altered in place. The changes of GeneTable return plain
+    tables, so a chromosome altered by a mutation no longer shares it
+    """
+    __slots__ = ()
+
+
+class RouteIndex:
+    def __init__(self, chromosome):
+        """
+        Trips of the path of each drone of a chromosome, to estimate the route moves without rebuilding any path. A
+        trip is a run of loads followed by the deliveries after them, which takes the same turns wherever the drone
+        comes from, so moving whole trips only changes the flights between them. A move is a list of windows
+        (drone, lo, hi, trips): the trips lo to hi - 1 of the drone are replaced by the trips listed, as
+        (drone, position) pairs of this index, and the trips after the window are only delayed or advanced.
+        The index owns a copy of the table of genes, set on the chromosome, and applies the moves to it in place
+        (see apply). Only the chromosome and its copies made to evaluate the moves may share the copy
+        :param chromosome: chromosome to index, its table of genes is replaced by the copy
+        """
+        assert not isinstance(chromosome.genes, _RouteTable), "the genes are already altered by another RouteIndex"
+        problem = chromosome.problem
+        self.genes = genes = _RouteTable(*(column.copy() for column in chromosome.genes.columns()))
+        chromosome.set_genes(genes, [])
+        self.distances = problem.distances()
+        self.turns = problem.turns
+        self.drones = problem.drones
+        self.__undo = None
+        self.rows = [np.empty(0, dtype=np.int64)] * self.drones  # positions of the genes of each path in the table
+        self.bounds = [[0]] * self.drones                           # first position of each trip in rows, and the end
+        self.first = [[] for _ in range(self.drones)]               # node of the first gene of each trip
+        self.last = [[] for _ in range(self.drones)]                # node of the last gene of each trip
+        self.inner = [[] for _ in range(self.drones)]               # turns of each trip after flying to its first node
+        self.end = [[] for _ in range(self.drones)]                 # turn each trip ends on
+        self.sums = [[0] for _ in range(self.drones)]               # running sum of the ends, starting from 0
+
+        assigned = np.flatnonzero(genes.drone != prim.GeneTable.NO_DRONE)
+        order = assigned[np.argsort(genes.drone[assigned], kind='stable')]
+        self.size = 0
+        if not len(order):
+            return
+        drone, node, demand = genes.drone[order], genes.node[order], genes.demand[order]
+
+        path_start = np.r_[True, drone[1:] != drone[:-1]]
+        trip_start = np.flatnonzero(path_start | ((demand > 0) & np.r_[True, demand[:-1] <= 0]))
+        previous = np.r_[START_NODE, node[:-1]]
+        step = self.distances[previous, node].astype(np.int64) + 1
+        step[trip_start] = 1  # the flight to the first node of a trip depends on the trip before it
+        inner = np.add.reduceat(step, trip_start)
+        first = node[trip_start]
+        last = node[np.r_[trip_start[1:], len(node)] - 1]
+
+        new_path = path_start[trip_start]
+        before = np.r_[START_NODE, last[:-1]]
+        before[new_path] = START_NODE
+        duration = self.distances[before, first] + inner
+        ends = np.cumsum(duration)
+        paths = np.flatnonzero(new_path)
+        counts = np.diff(np.r_[paths, len(trip_start)])
+        ends -= np.repeat(ends[paths] - duration[paths], counts)  # each path starts on turn 0
+        self.size = len(trip_start)
+
+        gene_start = trip_start[paths]
+        for path, (trip, count, offset) in enumerate(zip(paths.tolist(), counts.tolist(), gene_start.tolist())):
+            drone_id = int(drone[offset])
+            trips = slice(trip, trip + count)
+            length = (gene_start[path + 1] if path + 1 < len(paths) else len(order)) - offset
+            self.rows[drone_id] = order[offset:offset + length]
+            self.bounds[drone_id] = (trip_start[trips] - offset).tolist() + [length]
+            self.first[drone_id] = first[trips].tolist()
+            self.last[drone_id] = last[trips].tolist()
+            self.inner[drone_id] = inner[trips].tolist()
+            self.end[drone_id] = ends[trips].tolist()
+            self.sums[drone_id] = np.r_[0, np.cumsum(ends[trips])].tolist()
+
+    def trips(self, drone: int) -> int:
+        """
+        Number of trips of a drone
+        :param drone: identifier of the drone
+        :return: number of trips
+        """
+        return len(self.end[drone])
+
+    def routed(self, minimum: int = 1) -> list[int]:
+        """
+        Drones with some trips
+        :param minimum: minimum number of trips
+        :return: identifiers of the drones
+        """
+        return [drone for drone in range(self.drones) if len(self.end[drone]) >= minimum]
+
+    def delta(self, move: list) -> int:
+        """
+        Estimated change of the cost of the routes made by a move, negative if it improves them. The cost is the sum
+        of the turns each trip ends on, plus the turns of each path over the limit weighted by the number of trips,
+        so a turn over the limit costs as much as delaying every trip. It takes a constant time per trip of the
+        windows of the move, whatever the length of the paths. The cost is not the score, whose orders end on the
+        last of their deliveries on any drone: it is a screen, which can reject moves improving the score and
+        accept moves that don't, so the moves it accepts must still be evaluated
+        :param move: windows of the move (see RouteIndex)
+        :return: change of the cost
+        """
+        return sum(self.__window(*window) for window in move)
+
+    def __window(self, drone: int, lo: int, hi: int, trips: list) -> int:
+        """
+        Change of the cost of the path of a drone made by a window (see delta)
+        :param drone: identifier of the drone
+        :param lo: first trip replaced
+        :param hi: trip after the last one replaced
+        :param trips: (drone, position) of the trips replacing them
+        :return: change of the cost
+        """
+        end, sums, n = self.end[drone], self.sums[drone], len(self.end[drone])
+        node = self.last[drone][lo - 1] if lo else START_NODE
+        turn = end[lo - 1] if lo else 0
+        cost = sums[lo] - sums[hi]
+        for source, trip in trips:
+            turn += int(self.distances[node, self.first[source][trip]]) + self.inner[source][trip]
+            cost += turn
+            node = self.last[source][trip]
+
+        turns = turn
+        if hi < n:  # the trips after the window are shifted by the change of the first of them
+            shift = turn + int(self.distances[node, self.first[drone][hi]]) + self.inner[drone][hi] - end[hi]
+            cost += shift * (n - hi)
+            turns = end[-1] + shift
+        previous = end[-1] if n else 0
+        return cost + self.size * (max(0, turns - self.turns) - max(0, previous - self.turns))
+
+    def apply(self, move: list) -> set:
+        """
+        Applies a move to the table of genes in place, and to the trips of the index. Only the positions of the
+        genes of the altered drones are written, they take the genes of the drones in the order of their new paths,
+        so the cost is linear in the length of those paths. The move can be undone until the next one (see revert)
+        :param move: windows of the move (see RouteIndex)
+        :return: the drones whose paths were altered
+        """
+        paths = {drone: self.__path(drone, lo, hi, trips) for drone, lo, hi, trips in move}
+        positions = np.sort(np.concatenate([self.rows[drone] for drone in paths]))
+        sources = np.concatenate([self.rows[source][self.bounds[source][trip]:self.bounds[source][trip + 1]]
+                                  for path in paths.values() for source, trip in path])
+        states = {drone: self.__trips(path) for drone, path in paths.items()}
+        columns = self.genes.columns()
+        self.__undo = positions, [column[positions] for column in columns], \
+            {drone: self.__state(drone) for drone in paths}
+
+        for column, values in zip(columns, [column[sources] for column in columns]):
+            column[positions] = values
+        offset = 0
+        for drone, state in states.items():
+            length = state[0][-1]
+            rows = positions[offset:offset + length]
+            self.genes.drone[rows] = drone
+            self.__set_state(drone, (rows,) + state)
+            offset += length
+        self.genes.reindex({drone: self.rows[drone] for drone in paths})
+        return set(paths)
+
+    def revert(self) -> None:
+        """
+        Undoes the last move applied (see apply)
+        """
+        positions, values, states = self.__undo
+        for column, old in zip(self.genes.columns(), values):
+            column[positions] = old
+        for drone, state in states.items():
+            self.__set_state(drone, state)
+        self.genes.reindex({drone: self.rows[drone] for drone in states})
+        self.__undo = None
+
+    def __path(self, drone: int, lo: int, hi: int, trips: list) -> list:
+        """
+        Trips of the path of a drone after a window (see apply)
+        :param drone: identifier of the drone
+        :param lo: first trip replaced
+        :param hi: trip after the last one replaced
+        :param trips: (drone, position) of the trips replacing them
+        :return: (drone, position) of each trip of the path, in order
+        """
+        return [(drone, trip) for trip in range(lo)] + trips + [(drone, trip) for trip in range(hi, self.trips(drone))]
+
+    def __trips(self, path: list) -> tuple:
+        """
+        Trips of a path made of trips of this index, starting on the turn 0 (see apply)
+        :param path: (drone, position) of each trip of the path
+        :return: bounds, first, last, inner, end and sums of the path (see RouteIndex)
+        """
+        bounds, first, last, inner, end, sums = [0], [], [], [], [], [0]
+        node, turn = START_NODE, 0
+        for source, trip in path:
+            bounds.append(bounds[-1] + self.bounds[source][trip + 1] - self.bounds[source][trip])
+            first.append(self.first[source][trip])
+            last.append(self.last[source][trip])
+            inner.append(self.inner[source][trip])
+            turn += int(self.distances[node, first[-1]]) + inner[-1]
+            end.append(turn)
+            sums.append(sums[-1] + turn)
+            node = last[-1]
+        return bounds, first, last, inner, end, sums
+
+    def __state(self, drone: int) -> tuple:
+        """
+        Indexed values of the path of a drone
+        :param drone: identifier of the drone
+        :return: rows, bounds, first, last, inner, end and sums of the drone
+        """
+        return (self.rows[drone], self.bounds[drone], self.first[drone], self.last[drone], self.inner[drone],
+                self.end[drone], self.sums[drone])
+
+    def __set_state(self, drone: int, state: tuple) -> None:
+        """
+        Replaces the indexed values of the path of a drone
+        :param drone: identifier of the drone
+        :param state: rows, bounds, first, last, inner, end and sums of the drone
+        """
+        (self.rows[drone], self.bounds[drone], self.first[drone], self.last[drone], self.inner[drone],
+         self.end[drone], self.sums[drone]) = state
+
+
+def two_opt(index: RouteIndex, rng: np.random.Generator, span: int):
+    """
+    Reverses the order of a few consecutive trips of a drone
+    :param index: trips of the chromosome
+    :param rng: random generator of the move
+    :param span: maximum number of trips reversed
+    :return: windows of the move (see RouteIndex), None if no drone has 2 trips
+    """
+    drones = index.routed(2)
+    if not drones:
+        return None
+    drone = drones[rng.integers(0, len(drones))]
+    n = index.trips(drone)
+    i = int(rng.integers(0, n - 1))
+    j = int(rng.integers(i + 1, min(n, i + max(span, 2))))
+    return [(drone, i, j + 1, [(drone, k) for k in range(j, i - 1, -1)])]
+
+
+def or_opt(index: RouteIndex, rng: np.random.Generator, span: int):
+    """
+    Moves a chain of 1 to 3 consecutive trips of a drone to a close position of the same drone
+    :param index: trips of the chromosome
+    :param rng: random generator of the move
+    :param span: maximum number of trips the chain moves over
+    :return: windows of the move (see RouteIndex), None if no drone has 2 trips
+    """
+    drones = index.routed(2)
+    if not drones:
+        return None
+    drone = drones[rng.integers(0, len(drones))]
+    n = index.trips(drone)
+    length = int(rng.integers(1, min(3, n - 1) + 1))
+    i = int(rng.integers(0, n - length + 1))
+    positions = list(range(max(0, i - span), i)) + list(range(i + length + 1, min(n, i + length + span) + 1))
+    position = positions[rng.integers(0, len(positions))]
+
+    chain = [(drone, k) for k in range(i, i + length)]
+    if position < i:
+        return [(drone, position, i + length, chain + [(drone, k) for k in range(position, i)])]
+    return [(drone, i, position, [(drone, k) for k in range(i + length, position)] + chain)]
+
+
+def relocate(index: RouteIndex, rng: np.random.Generator, span: int):
+    """
+    Moves a trip, with its loads and deliveries, to any position of another drone
+    :param index: trips of the chromosome
+    :param rng: random generator of the move
+    :param span: unused, every position of the other drone can be chosen
+    :return: windows of the move (see RouteIndex), None if there is a single drone or no trip
+    """
+    drones = index.routed(1)
+    if not drones or index.drones < 2:
+        return None
+    source = drones[rng.integers(0, len(drones))]
+    target = int(rng.integers(0, index.drones - 1))
+    target += target >= source
+    trip = int(rng.integers(0, index.trips(source)))
+    position = int(rng.integers(0, index.trips(target) + 1))
+    return [(source, trip, trip + 1, []), (target, position, position, [(source, trip)])]
+
+
+def swap(index: RouteIndex, rng: np.random.Generator, span: int):
+    """
+    Exchanges a trip of a drone with a trip of another drone, each one taking the place of the other
+    :param index: trips of the chromosome
+    :param rng: random generator of the move
+    :param span: unused, any trip of the drones can be chosen
+    :return: windows of the move (see RouteIndex), None if less than 2 drones have trips
+    """
+    drones = index.routed(1)
+    if len(drones) < 2:
+        return None
+    first, second = rng.choice(len(drones), 2, replace=False).tolist()
+    drone1, drone2 = drones[first], drones[second]
+    trip1 = int(rng.integers(0, index.trips(drone1)))
+    trip2 = int(rng.integers(0, index.trips(drone2)))
+    return [(drone1, trip1, trip1 + 1, [(drone2, trip2)]), (drone2, trip2, trip2 + 1, [(drone1, trip1)])]
+
+
+# moves of the local search (see search.heuristics.local_search), chosen uniformly
+ROUTE_MOVES = [two_opt, or_opt, relocate, swap]
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import numpy as np
+
+import objects.primitives as prim
+
+# Replay of a submission with the rules of the Hash Code 2016 qualification round. Every drone starts on the first
+# warehouse at turn 0 and executes its commands in the order they were given:
+# - L (load) and U (unload) fly to a warehouse, D (deliver) flies to an order, taking the distance + 1 turns
+# - W (wait) stays where the drone is for the given number of turns
+# A command taking k turns that starts at turn t completes at turn t + k - 1, and every command must complete before
+# turn T (the number of turns of the problem). An order is complete on the turn of the delivery of its last item and
+# is worth ceil((T - t) / T * 100) points. Loads and unloads change the stock of a warehouse on the turn they
+# complete, the unloads of a turn are available to the loads of the same turn. The loads and unloads are kept until
+# the simulation ends to check the stock in that order, so its memory is O(loads + unloads)
+
+# kind of each command, in the kind column of a command array
+LOAD, DELIVER, UNLOAD, WAIT = range(4)
+COMMANDS = {'L': LOAD, 'D': DELIVER, 'U': UNLOAD, 'W': WAIT}
+
+# rules checked by the simulation, each violation is counted under one of them
+RULES = ('command', 'deadline', 'payload', 'carried', 'order', 'stock')
+
+
+def path_commands(drone_paths) -> np.ndarray:
+    """
+    Commands of the paths of a solution, in the same order as export_data writes them
+
+    :param drone_paths: DronePaths of the solution
+    :return: n x 5 array with the drone, kind, target (warehouse or order id), product and quantity of each command
+    """
+    tables = []
+    for path in drone_paths.values():
+        genes = path.genes
+        n_warehouses = len(path.problem.warehouses)
+        loads = genes.demand > 0
+        tables.append(np.stack((np.full(len(genes), path.drone_id), np.where(loads, LOAD, DELIVER),
+                                np.where(loads, genes.node, genes.node - n_warehouses), genes.product,
+                                np.abs(genes.demand)), axis=1))
+    return np.concatenate(tables).astype(np.int64) if tables else np.empty((0, 5), dtype=np.int64)
+
+
+def simulate(problem: prim.Problem, commands: np.ndarray) -> Simulation:
+    """
+    Replays a list of commands
+
+    :param problem: problem solved by the commands
+    :param commands: n x 5 array of commands (see path_commands)
+    :return: the finished Simulation, see Simulation.result
+    """
+    simulation = Simulation(problem)
+    simulation.run(commands)
+    return simulation
+
+
+def official_rank(chromosome: prim.Chromosome) -> tuple[bool, int]:
+    """
+    Ranks a solution by the official rules, the ground truth its score (see Chromosome.update_internal) approximates
+
+    :param chromosome: the solution, updated first if needed
+    :return: whether the solution follows every rule and its official score, the highest is the best
+    """
+    chromosome.update_internal()
+    result = simulate(chromosome.problem, path_commands(chromosome.solution)).result()
+    return result["valid"], result["score"]
+
+
+def best_official(candidates: list[prim.Chromosome]) -> prim.Chromosome:
+    """
+    Best of some solutions by the official rules (see official_rank), the valid ones first
+
+    :param candidates: the solutions
+    :return: the best solution, the first one on a tie
+    """
+    return max(candidates, key=official_rank)
+
+
+def _running(values: np.ndarray, group_first: np.ndarray) -> np.ndarray:
+    """
+    Running sum of consecutive groups of values
+
+    :param values: values of every group, one group after the other
+    :param group_first: position of the first value of the group of each value
+    :return: sum of the values of the group up to each value (inclusive)
+    """
+    total = np.cumsum(values)
+    return total - (total - values)[group_first]
+
+
+def _groups(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sorts values by a key, keeping the order of the values with the same key
+
+    :param keys: key of each value
+    :return: the sorting permutation and, for each sorted value, the position of the first value with its key
+    """
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+    return order, np.repeat(first, np.diff(np.r_[first, len(keys)]))
+
+
+class Simulation:
+    def __init__(self, problem: prim.Problem, max_errors: int = 20):
+        """
+        State of the replay of a submission. The commands are fed in chunks (see run), so the state only depends on the
+        size of the problem, along with 20 bytes for each load or unload: the stock of the warehouses is checked in
+        the order of the turns when the simulation ends, and a later command may take place before an earlier one
+        :param problem: problem solved by the submission
+        :param max_errors: number of violations described in the result, the others are only counted
+        """
+        self.problem = problem
+        self.max_errors = max_errors
+        n_products = len(problem.products)
+        self.commands = 0                                                   # commands run so far
+        self.turns = np.zeros(problem.drones, dtype=np.int64)               # turns spent by each drone
+        self.nodes = np.zeros(problem.drones, dtype=np.int64)               # node index of each drone
+        self.weights = np.zeros(problem.drones, dtype=np.int64)             # weight carried by each drone
+        self.carried = np.zeros((problem.drones, n_products), dtype=np.int64)
+        self.remaining = np.zeros((len(problem.orders), n_products), dtype=np.int64)  # items left on each order
+        for order in problem.orders:
+            for product_id, quantity in order.products.items():
+                self.remaining[order.id, product_id] = quantity
+        self.delivered = np.full(len(problem.orders), -1, dtype=np.int64)  # turn of the last delivery to each order
+        self.violations = dict.fromkeys(RULES, 0)
+        self.errors: list[tuple[int, str]] = []                             # command index and description
+        self.__stock_errors: list[tuple[int, str]] = []
+        self.__events: list[np.ndarray] = []    # turn, warehouse, product, stock change and index of loads/unloads
+        self.__stock_checked = True
+
+    def run(self, commands: np.ndarray) -> None:
+        """
+        Runs the next commands of the submission
+
+        :param commands: n x 5 array with the drone, kind, target (warehouse or order id), product and quantity of
+        each command (see COMMANDS). The quantity of a wait is its number of turns and its target and product are
+        ignored
+        """
+        commands = np.asarray(commands, dtype=np.int64).reshape(-1, 5)
+        index = self.commands + np.arange(len(commands))
+        self.commands += len(commands)
+        valid = self.__check_commands(commands, index)
+        drone, kind, target, product, quantity = commands[valid].T
+        index = index[valid]
+        if not len(drone):
+            return
+
+        # the commands of each drone together, in the order they were given
+        order, group_first = _groups(drone)
+        drone, kind, target, product, quantity, index = (column[order] for column in
+                                                         (drone, kind, target, product, quantity, index))
+        waits = kind == WAIT
+        target, product = target * ~waits, product * ~waits  # ignored by the waits
+        last = np.flatnonzero(np.r_[drone[1:] != drone[:-1], True])  # last command of each drone
+
+        # a wait keeps the drone on the node of its previous command
+        n_warehouses = len(self.problem.warehouses)
+        node = np.where(kind == DELIVER, target + n_warehouses, target)
+        moved = np.maximum.accumulate(np.where(waits, -1, np.arange(len(node))))
+        node = np.where(moved >= group_first, node[np.maximum(moved, 0)], self.nodes[drone])
+        previous = np.where(group_first == np.arange(len(node)), self.nodes[drone], np.r_[0, node[:-1]])
+
+        duration = np.where(waits, quantity, self.problem.distances()[previous, node] + 1)
+        turn = self.turns[drone] + _running(duration, group_first) - 1
+        self.__violation('deadline', turn >= self.problem.turns, index,
+                         lambda i: "drone {0} completes the command on turn {1}".format(drone[i], turn[i]))
+        self.turns[drone[last]], self.nodes[drone[last]] = turn[last] + 1, node[last]
+
+        signed = np.where(kind == LOAD, quantity, -quantity) * ~waits
+        weight = self.weights[drone] + _running(signed * self.problem.weights[product], group_first)
+        self.__violation('payload', (kind == LOAD) & (weight > self.problem.payload), index,
+                         lambda i: "drone {0} carries {1} of {2}".format(drone[i], weight[i], self.problem.payload))
+        self.weights[drone[last]] = weight[last]
+
+        # items of each product on each drone
+        moves = np.flatnonzero(~waits)
+        by_product, product_first = _groups(drone[moves] * len(self.problem.products) + product[moves])
+        moves = moves[by_product]
+        carried = self.carried[drone[moves], product[moves]] + _running(signed[moves], product_first)
+        self.__violation('carried', (kind[moves] != LOAD) & (carried < 0), index[moves],
+                         lambda i: "drone {0} lacks {1} items of product {2}".format(drone[moves][i], -carried[i],
+                                                                                     product[moves][i]))
+        np.add.at(self.carried, (drone[moves], product[moves]), signed[moves])
+
+        # items of each product left on each order, the deliveries of every drone in the order they were given
+        deliveries = np.flatnonzero(kind == DELIVER)
+        deliveries = deliveries[np.argsort(index[deliveries])]
+        by_order, order_first = _groups(target[deliveries] * len(self.problem.products) + product[deliveries])
+        deliveries = deliveries[by_order]
+        remaining = self.remaining[target[deliveries], product[deliveries]] - \
+            _running(quantity[deliveries], order_first)
+        self.__violation('order', remaining < 0, index[deliveries],
+                         lambda i: "order {0} receives {1} more items of product {2} than ordered"
+                         .format(target[deliveries][i], -remaining[i], product[deliveries][i]))
+        np.subtract.at(self.remaining, (target[deliveries], product[deliveries]), quantity[deliveries])
+        np.maximum.at(self.delivered, target[deliveries], turn[deliveries])
+
+        stock = np.flatnonzero((kind == LOAD) | (kind == UNLOAD))
+        if len(stock):
+            self.__events.append(np.stack((turn[stock], target[stock], product[stock], -signed[stock],
+                                           index[stock]), axis=1).astype(np.int32))
+            self.__stock_checked = False
+
+    def completion_turns(self) -> np.ndarray:
+        """
+        Turn each order was completed on
+
+        :return: array indexed by order id, -1 for the orders that were not completed
+        """
+        complete = (self.remaining == 0).all(axis=1) & (self.delivered < self.problem.turns)
+        return np.where(complete, self.delivered, -1)
+
+    def score(self) -> int:
+        """
+        Score of the commands run so far, regardless of their violations
+
+        :return: sum of the points of every completed order
+        """
+        turns = self.completion_turns()
+        turns = turns[turns >= 0]
+        return int((-((turns - self.problem.turns) * 100 // self.problem.turns)).sum())  # exact ceil
+
+    def result(self) -> dict:
+        """
+        Outcome of the commands run so far
+
+        :return: dictionary with the score, whether every rule was followed (valid), the number of commands and
+        completed orders, the number of turns used, the number of violations of each rule and the description of
+        the first ones (errors)
+        """
+        self.__check_stock()
+        return {
+            "score": self.score(),
+            "valid": not any(self.violations.values()),
+            "commands": self.commands,
+            "completed": int((self.completion_turns() >= 0).sum()),
+            "turns": int(self.turns.max(initial=0)),
+            "violations": dict(self.violations),
+            "errors": ["command {0}: {1}".format(i, message)
+                       for i, message in sorted(self.errors + self.__stock_errors)[:self.max_errors]],
+        }
+
+    def __check_commands(self, commands: np.ndarray, index: np.ndarray) -> np.ndarray:
+        """
+        Checks the identifiers and quantities of some commands, the others are skipped by the simulation
+
+        :param commands: n x 5 array of commands
+        :param index: index of each command on the submission
+        :return: mask of the well-formed commands
+        """
+        drone, kind, target, product, quantity = commands.T
+        problem = self.problem
+        n_targets = np.where(kind == DELIVER, len(problem.orders), len(problem.warehouses))
+        valid = (drone >= 0) & (drone < problem.drones) & (kind >= 0) & (kind <= WAIT) & (quantity > 0) & \
+                ((kind == WAIT) | ((target >= 0) & (target < n_targets) & (product >= 0) &
+                                   (product < len(problem.products))))
+        self.__violation('command', ~valid, index, lambda i: "unreadable command" if commands[i, 1] < 0 else
+                         "malformed command {0}".format(commands[i].tolist()))
+        return valid
+
+    def __check_stock(self) -> None:
+        """
+        Checks the stock of the warehouses, in the order of the turns of the loads and unloads
+        """
+        if self.__stock_checked:
+            return
+        self.__stock_checked = True
+        events = np.concatenate(self.__events)
+        self.__events = [events]
+
+        keys = events[:, 1].astype(np.int64) * len(self.problem.products) + events[:, 2]
+        order = np.lexsort((events[:, 4], events[:, 3] < 0, events[:, 0], keys))  # unloads of a turn before loads
+        keys = keys[order]
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        del keys
+        turn, warehouse, product, change, index = events[order].T
+        stock = self.problem.stock[warehouse, product] + \
+            _running(change.astype(np.int64), np.repeat(first, np.diff(np.r_[first, len(order)])))
+
+        self.violations['stock'] = 0
+        self.__stock_errors = self.__violation('stock', (change < 0) & (stock < 0), index,
+                                               lambda i: "warehouse {0} lacks {1} items of product {2} on turn {3}"
+                                               .format(warehouse[i], -stock[i], product[i], turn[i]))
+
+    def __violation(self, rule: str, mask: np.ndarray, index: np.ndarray, describe) -> list[tuple[int, str]]:
+        """
+        Counts the violations of a rule, describing the first ones. The descriptions are kept with the errors, except
+        for the stock (it is checked again when more commands are run)
+
+        :param rule: name of the rule (see RULES)
+        :param mask: True for the commands that violate the rule
+        :param index: index of each command on the submission
+        :param describe: function returning the description of a violation, given its position on the mask
+        :return: command index and description of the first violations
+        """
+        positions = np.flatnonzero(mask)
+        self.violations[rule] += len(positions)
+        errors = [(int(index[i]), describe(i))
+                  for i in positions[np.argsort(index[positions], kind="stable")][:self.max_errors].tolist()]
+        if rule != 'stock':
+            self.errors = sorted(self.errors + errors)[:self.max_errors]
+        return errors
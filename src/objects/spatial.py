@@ -0,0 +1,40 @@
+import numpy as np
+
+import objects.primitives as prim
+
+
+class SpatialIndex:
+    def __init__(self, problem: prim.Problem, stock: prim.StockIndex):
+        """
+        Index of the warehouses used while building a solution. The warehouses of every node are sorted by distance
+        once, and the stock is read from the StockIndex, so the answers stay correct while products are reserved.
+        The queries are linear in the number of warehouses, without sorting: the input files have at most 16
+        warehouses, too few for a grid or a k-d tree to pay off
+        :param problem: problem of the warehouses
+        :param stock: stock left on the warehouses
+        """
+        self.problem = problem
+        self.stock = stock
+        # warehouses come first on the node index, the stable sort lets the lowest id win the ties
+        self.nearest = np.argsort(problem.distances()[:, :len(problem.warehouses)], axis=1, kind="stable")
+
+    def nearest_warehouses(self, node: int, product_id: int, k: int = None) -> list[prim.Warehouse]:
+        """
+        The k nearest warehouses that still stock a product
+        :param node: node index of the position of the search (see Problem.get_node)
+        :param product_id: identifier of the product
+        :param k: maximum number of warehouses, defaults to every warehouse with stock
+        :return: list of warehouses, nearest first (ties are won by the lowest id)
+        """
+        ids = self.nearest[node]
+        ids = ids[self.stock.quantities[ids, product_id] > 0]
+        return [self.problem.warehouses[i] for i in ids[:k].tolist()]
+
+    def warehouses_with_any(self, products: dict[int, int]) -> list[prim.Warehouse]:
+        """
+        Warehouses that still stock any of the products (the same as filtering with StockIndex.has_any_product)
+        :param products: products and quantities
+        :return: list of warehouses, sorted by id
+        """
+        stocked = (self.stock.quantities[:, list(products)] > 0).any(axis=1)
+        return [self.problem.warehouses[i] for i in np.flatnonzero(stocked).tolist()]
@@ -0,0 +1,116 @@
+"""
+Reading, checking and scoring of submission files. A file is read and simulated in chunks of lines, so the commands are
+never held in memory at once, but the memory is not bounded: it grows with the number of loads and unloads, about
+20 bytes each (50 MB for a million of them). The stock of the warehouses is only checked in the order of the turns once
+every command is read (see Simulation), since a later command of another drone may take place before an earlier one
+"""
+import gzip
+import re
+import warnings
+
+import numpy as np
+
+import objects.primitives as prim
+from objects.simulator import COMMANDS, Simulation
+
+# lines of a chunk in the exact format written by export_data, parsed without looking at each line
+_STRICT = re.compile(r'(?:\d+ [LDU] \d+ \d+ \d+\n|\d+ W \d+\n)*')
+_KINDS = str.maketrans({'L': str(COMMANDS['L']), 'D': str(COMMANDS['D']), 'U': str(COMMANDS['U'])})
+_WAIT = ' {0} 0 0 '.format(COMMANDS['W'])  # a wait has no target nor product
+
+
+def read_commands(file, chunk_size: int = 1 << 20):
+    """
+    Reads the commands of a submission in chunks, after its first line (the number of commands)
+
+    :param file: submission opened in binary mode
+    :param chunk_size: bytes read at once
+    :return: generator of n x 5 arrays of commands (see Simulation.run), the lines that can't be read are commands
+    of kind -1
+    """
+    rest = b''
+    while True:
+        block = file.read(chunk_size)
+        data = rest + block
+        if block:
+            cut = data.rfind(b'\n') + 1
+            data, rest = data[:cut], data[cut:]
+        elif data and not data.endswith(b'\n'):
+            data += b'\n'
+        if data:
+            yield parse_commands(data.decode('ascii', errors='replace'))
+        if not block:
+            return
+
+
+def parse_commands(text: str) -> np.ndarray:
+    """
+    Parses lines of commands
+
+    :param text: whole lines, each one ending with a newline
+    :return: n x 5 array of commands (see Simulation.run), the lines that can't be read are commands of kind -1
+    """
+    if _STRICT.fullmatch(text):
+        text = text.translate(_KINDS).replace(' W ', _WAIT)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            return np.fromstring(text, dtype=np.int64, sep=' ').reshape(-1, 5)
+
+    commands = []
+    for line in text.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        if len(tokens) == 3 and tokens[1] == 'W':
+            tokens = [tokens[0], 'W', '0', '0', tokens[2]]
+        try:
+            if len(tokens) != 5 or tokens[1] not in COMMANDS:
+                raise ValueError
+            commands.append([int(tokens[0]), COMMANDS[tokens[1]], *map(int, tokens[2:])])
+        except ValueError:
+            commands.append([0, -1, 0, 0, 0])
+    return np.array(commands, dtype=np.int64).reshape(-1, 5)
+
+
+def open_submission(file_path: str):
+    """
+    Opens a submission for reading, decompressing it if it was written with gzip (see export_data)
+
+    :param file_path: path to the submission
+    :return: binary file object, to be used as a context manager
+    """
+    with open(file_path, 'rb') as file:
+        compressed = file.read(2) == b'\x1f\x8b'
+    return gzip.open(file_path, 'rb') if compressed else open(file_path, 'rb')
+
+
+def validate_submission(problem: prim.Problem, file_path: str, chunk_size: int = 1 << 20,
+                        max_errors: int = 20) -> dict:
+    """
+    Checks a submission file against a problem and scores it, reading it in chunks: besides the chunk being read,
+    the memory only depends on the size of the problem and the number of loads and unloads (see Simulation)
+
+    :param problem: problem solved by the submission
+    :param file_path: path to the submission, plain or compressed with gzip
+    :param chunk_size: bytes read at once
+    :param max_errors: number of violations described in the result, the others are only counted
+    :return: dictionary of Simulation.result, where the violations also count a first line that is not the number
+    of commands (format)
+    """
+    simulation = Simulation(problem, max_errors)
+    with open_submission(file_path) as file:
+        header = file.readline().strip()
+        for commands in read_commands(file, chunk_size):
+            simulation.run(commands)
+
+    result = simulation.result()
+    declared = int(header) if header.isdigit() else None
+    result["violations"]["format"] = int(declared != result["commands"])
+    if declared is None:
+        result["errors"].insert(0, "the first line is not the number of commands")
+    elif declared != result["commands"]:
+        result["errors"].insert(0, "the first line declares {0} commands, the file has {1}"
+                                .format(declared, result["commands"]))
+    result["errors"] = result["errors"][:max_errors]
+    result["valid"] = result["valid"] and declared == result["commands"]
+    return result
@@ -0,0 +1,144 @@
+from __future__ import annotations
+import os
+import pickle
+import signal
+import tempfile
+from time import monotonic
+
+import numpy as np
+
+from objects.export import export_data
+from objects.primitives import Chromosome
+
+# signals stopping a search cleanly while a budget is entered (see Budget.__enter__)
+SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class Budget:
+    def __init__(self, seconds: float = None, checkpoint: str = None, interval: float = 60.0, output: str = None,
+                 resume: bool = False):
+        """
+        Limits of a search besides its number of iterations, and the files keeping its progress. Every few seconds
+        the search saves a checkpoint, with its state and the state of its random generator, and exports the best
+        solution found so far. A search stops at the next iteration once the time is over or a stop was requested
+        (see stop), saving both files before it returns its best solution
+        :param seconds: wall-clock seconds from the creation of the budget, None for no limit
+        :param checkpoint: path of the checkpoint file, None to not save any
+        :param interval: seconds between checkpoints
+        :param output: path of the submission file of the best solution so far (see export_data), None to not export it
+        :param resume: flag to continue the search from the checkpoint file, if it was saved by the same search
+        """
+        self.deadline = None if seconds is None else monotonic() + seconds
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self.output = output
+        self.resume = resume
+        self.__stop = [False]  # shared with the budgets of the stages (see stage)
+        self.__saved = monotonic()
+        self.__handlers = {}
+
+    def __enter__(self) -> Budget:
+        """
+        Stops the searches using this budget on SIGINT and SIGTERM, instead of interrupting them. The handlers can
+        only be set from the main thread, elsewhere the signals keep their handlers
+        :return: this budget
+        """
+        for signum in SIGNALS:
+            try:
+                self.__handlers[signum] = signal.signal(signum, self.__signal)
+            except ValueError:
+                break
+        return self
+
+    def __exit__(self, *_) -> None:
+        """
+        Restores the handlers of the signals
+        """
+        for signum, handler in self.__handlers.items():
+            signal.signal(signum, handler)
+        self.__handlers = {}
+
+    def __signal(self, signum, _) -> None:
+        """
+        Handler of the signals, a second signal gets its previous handler
+        :param signum: number of the signal
+        """
+        self.stop()
+        signal.signal(signum, self.__handlers.get(signum, signal.SIG_DFL))
+
+    def stop(self) -> None:
+        """
+        Requests the searches using this budget to stop
+        """
+        self.__stop[0] = True
+
+    def stopped(self) -> bool:
+        """
+        Checks if the searches should stop
+        :return: true if a stop was requested or the time is over
+        """
+        return self.__stop[0] or (self.deadline is not None and monotonic() >= self.deadline)
+
+    def stage(self, name: str) -> Budget:
+        """
+        Budget of a stage of a pipeline, sharing the deadline and the stop requests of this budget, with its own
+        checkpoint file (the path of this one followed by the name)
+        :param name: name of the stage
+        :return: the budget of the stage
+        """
+        budget = Budget(None, None if self.checkpoint is None else self.checkpoint + "." + name, self.interval,
+                        self.output, self.resume)
+        budget.deadline, budget.__stop = self.deadline, self.__stop
+        return budget
+
+    def tick(self, best: Chromosome, state, rng: np.random.Generator) -> bool:
+        """
+        Called by a search before each iteration, saves its progress if the last save was long enough ago
+        :param best: best solution found so far
+        :param state: function returning the state of the search (see save)
+        :param rng: random generator of the search
+        :return: true if the search should stop
+        """
+        if monotonic() - self.__saved >= self.interval:
+            self.save(best, state(), rng)
+        return self.stopped()
+
+    def save(self, best: Chromosome, state: dict, rng: np.random.Generator) -> None:
+        """
+        Exports the best solution found so far and saves a checkpoint, both replacing their files at once
+        :param best: best solution found so far
+        :param state: state of the search, it must include the name of the search (solver) and only plain values
+        and arrays (the encoded genes of each solution, see GeneTable.encode)
+        :param rng: random generator of the search, its state is saved along with the search
+        """
+        if self.output is not None:
+            best.update_internal()
+            export_data(best.solution, self.output)
+        if self.checkpoint is not None:
+            content = pickle.dumps({**state, 'random': rng.bit_generator.state})
+            descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.checkpoint)),
+                                                     suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as file:
+                    file.write(content)
+                os.replace(temporary, self.checkpoint)
+            except BaseException:
+                os.remove(temporary)
+                raise
+        self.__saved = monotonic()
+
+    def load(self, solver: str, rng: np.random.Generator) -> dict:
+        """
+        Reads the checkpoint of a search to resume it, restoring its random generator
+        :param solver: name of the search
+        :param rng: random generator of the search, set to the state it had when the checkpoint was saved
+        :return: state of the search (see save), None if it is not resumed or the checkpoint is of another search
+        """
+        if not self.resume or self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return None
+        with open(self.checkpoint, 'rb') as file:
+            state = pickle.load(file)
+        if state.get('solver') != solver:
+            return None
+        rng.bit_generator.state = state['random']
+        return state
@@ -1,61 +1,91 @@
-def check_turns(drone_path, turns):
+import numpy as np
+
+
+def check_turns(step_turns: np.ndarray, turns: int) -> int:
     """
     The max turns on a gene must not be higher than the max allowed turns
 
-    :param drone_path: list containing the paths for every drone
+    :param step_turns: turn of each gene of a drone
     :param turns: max turns allowed
-    :return: 0 if the constraint was fulfilled, 0 otherwise
+    :return: 1 if the constraint was unfulfilled, 0 otherwise
     """
-    final_turn = max(gene.turn for gene in drone_path.steps)
-    if final_turn > turns:
-        return 1
-    return 0
+    return int(len(step_turns) > 0 and step_turns[-1] > turns)  # the turns only grow along a path
 
 
-def check_payload(drone_path, products, prob_payload):
+def check_payload(demands: np.ndarray, weights: np.ndarray, prob_payload: int) -> np.ndarray:
     """
-    Checks if any drone exceeded the max allowed payload
+    Checks after every gene of a drone if it exceeded the max allowed payload, with the running sum of the weight
+    it carries
 
-    :param drone_path: list containing the paths for every drone
-    :param products: list containing the problem's products
+    :param demands: quantity of each gene of a drone, positive for loads and negative for deliveries
+    :param weights: weight of the product of each gene
     :param prob_payload: max payload allowed for a drone
-    :return: the number of times this constraint was unfulfilled
+    :return: 1 for the genes where this constraint was unfulfilled, 0 for the others
     """
-
-    penalty = 1
-    penalty_applied = 0
-
-    payload = 0
-    for gene in drone_path.steps:
-        payload += gene.demand * products[gene.product.id].weight
-        if payload > prob_payload:
-            gene.penalty += penalty
-            penalty_applied += penalty
-    return penalty_applied
+    return (np.cumsum(demands.astype(np.int64) * weights) > prob_payload).astype(np.int32)
 
 
-def check_delivery(drone_path):
+def check_delivery(demands: np.ndarray, products: np.ndarray) -> np.ndarray:
     """
-    Checks if the drones have the product and the necessary amount before every delivery
+    Checks if the drone has the product and the necessary amount before every delivery. A delivery that fails
+    doesn't take anything from the drone, so the balance of each product is the running sum of its loads and
+    successful deliveries
 
-    :param drone_path:  list containing the paths for every drone
-    :return: the number of times this constraint was unfulfilled
+    :param demands: quantity of each gene of a drone, positive for loads and negative for deliveries
+    :param products: identifier of the product of each gene
+    :return: 1 for the genes where this constraint was unfulfilled, 0 for the others
     """
+    n = len(demands)
+    penalties = np.zeros(n, dtype=np.int32)
+    if not n:
+        return penalties
 
-    penalty = 1
-    penalty_applied = 0
+    # the genes of each product together, in the order of the path
+    order = np.argsort(products, kind="stable")
+    product, demand = products[order], demands[order].astype(np.int64)
+    first = np.flatnonzero(np.r_[True, product[1:] != product[:-1]])  # first gene of each product
+    last = np.r_[first[1:], n]
+    group = np.repeat(np.arange(len(first)), last - first)
 
-    products = {}
-    for gene in drone_path.steps:
-        if gene.demand > 0:
-            if gene.product.id in products.keys():
-                products[gene.product.id] += gene.demand
-            else:
-                products[gene.product.id] = gene.demand
-        else:
-            if gene.product.id not in products.keys() or abs(gene.demand) > products[gene.product.id]:
-                gene.penalty += penalty
-                penalty_applied += penalty
+    def before(values):  # running sum of each product, excluding the current gene
+        total = np.cumsum(values) - values
+        return total - total[first][group]
+
+    # the deliveries before any load of their product fail whatever the balance
+    deliveries = demand <= 0
+    failed = deliveries & (before((demand > 0).astype(np.int64)) == 0)
+    balance = before(np.where(failed, 0, demand))
+    unfulfilled = np.flatnonzero(deliveries & ~failed & (-demand > balance))
+
+    # the first balance failure of a product is certain, but it leaves more stock for its later deliveries, so the
+    # rest of the genes of that product are settled in one pass
+    _, firsts = np.unique(group[unfulfilled], return_index=True)
+    for start in unfulfilled[firsts].tolist():
+        stock = int(balance[start])
+        stop = int(last[group[start]])
+        for i, (quantity, skipped) in enumerate(zip(demand[start:stop].tolist(), failed[start:stop].tolist()), start):
+            if skipped:
                 continue
-            products[gene.product.id] += gene.demand
-    return penalty_applied
+            if quantity <= 0 and -quantity > stock:
+                failed[i] = True
+            else:
+                stock += quantity
+
+    penalties[order] = failed
+    return penalties
+
+
+def check_drone_path(drone_path, weights: np.ndarray, prob_payload: int, turns: int) -> int:
+    """
+    Checks every constraint on the path of a drone, filling the penalty of each of its genes
+
+    :param drone_path: path of the drone, with the turn of each gene already calculated
+    :param weights: weight of each product of the problem
+    :param prob_payload: max payload allowed for a drone
+    :param turns: max turns allowed
+    :return: the number of times the constraints were unfulfilled
+    """
+    genes = drone_path.genes
+    drone_path.step_penalties = check_payload(genes.demand, weights[genes.product], prob_payload) + \
+        check_delivery(genes.demand, genes.product)
+    return int(drone_path.step_penalties.sum()) + check_turns(drone_path.step_turns, turns)
@@ -1,26 +1,58 @@
 import concurrent.futures
-import pandas as pd
-import matplotlib.pyplot as plt
+import contextlib
+import multiprocessing
+import os
+from time import perf_counter
 
 from objects.primitives import *
-from numpy import random, mean
+import numpy as np
+from numpy import mean
+import objects.profiling as profiling
+from objects.simulator import best_official
+from search.budget import Budget
+from search.progress import MultiSink, ProgressSink, SampleSink
 import search.greedy_solution as greed
+import search.parallel as par
 
 
-def create_population(n_pop) -> list[Chromosome]:
+def create_population(problem: Problem, n_pop, rng: np.random.Generator,
+                      executor: concurrent.futures.Executor = None) -> list[Chromosome]:
     """
     Creates a random population using a non greedy algorithm
 
+    :param problem: problem to solve
     :param n_pop: number of individuals (chromosomes)
+    :param rng: random generator of the population
+    :param executor: pool of processes (see parallel.process_pool) building the individuals, None builds them here
     :return: list containing a population
     """
-    population = []
+    if executor is None:
+        return [greed.greedy_solution(problem, False, rng) for _ in range(n_pop)]
+
+    # each individual has its own random generator, derived from this one
+    encoded = executor.map(par.build_solution, par.spawn(rng, n_pop), chunksize=par.chunk_size(n_pop))
+    return [Chromosome(problem, GeneTable.decode(genes)) for genes in encoded]
 
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        for i in range(n_pop):
-            population.append(executor.submit(greed.greedy_solution, False))
 
-    return list(map(lambda x: x.result(), population))
+def evaluate_population(pop: list[Chromosome], executor: concurrent.futures.Executor = None) -> list[float]:
+    """
+    Evaluates every individual of a population
+
+    :param pop: sample population (chromosomes)
+    :param executor: pool of processes (see parallel.process_pool) evaluating the individuals, None evaluates them
+    here. Only the score and penalty of the individuals are filled by the processes
+    :return: list with the score of each individual (including penalties)
+    """
+    if executor is None:
+        return [c.update_internal() for c in pop]
+
+    encoded = [c.genes.encode() for c in pop]
+    scores = []
+    for c, (score, penalty) in zip(pop, executor.map(par.evaluate_solution, encoded,
+                                                     chunksize=par.chunk_size(len(pop)))):
+        c.score, c.penalty = score + penalty, penalty
+        scores.append(score)
+    return scores
 
 
 def best_individual(pop: list[Chromosome]) -> (Chromosome, float):
@@ -37,58 +69,55 @@ def best_individual(pop: list[Chromosome]) -> (Chromosome, float):
     return current_best
 
 
-def selection(pop, scores, k=3) -> Chromosome:
+def selection(pop, scores, rng: np.random.Generator, k=3) -> Chromosome:
     """
     Tournament Selection: chooses an individual and makes it "fight" with the rest
     of the population
 
     :param pop: sample population (chromosomes)
     :param scores: list with scores (evaluation function)
+    :param rng: random generator of the tournament
     :param k: number of tournament participants
     :return: the best chromosome
     """
     # first random selection
-    selection_ix = random.randint(len(pop))
-    for ix in random.randint(0, len(pop), k - 1):
+    selection_ix = rng.integers(len(pop))
+    for ix in rng.integers(0, len(pop), k - 1):
         # check if better (e.g. perform a tournament)
         if scores[ix] > scores[selection_ix]:
             selection_ix = ix
     return pop[selection_ix]
 
 
-def crossover(p1: Chromosome, p2: Chromosome, r_cross: float) -> list[Chromosome]:
+def crossover(p1: Chromosome, p2: Chromosome, r_cross: float, rng: np.random.Generator) -> list[Chromosome]:
     """
     Crossover operation between two chromosomes with a given rate
 
     :param p1: first chromosome
     :param p2: second chromosome
     :param r_cross: Crossover Rate (probabilistic)
+    :param rng: random generator of the crossover
     :return: two resulting chromosomes after the crossover operation
     """
-    if random.random() <= r_cross:
+    if rng.random() <= r_cross:
         # ver tamanhos de ambos os cromossomas
         # escolher menor dos 2
         max_length = min(len(p1.genes), len(p2.genes))
 
         # escolher tamanho de 1 até o valor de cima
-        size = random.randint(1, max_length) if  max_length > 1 else 1
+        size = rng.integers(1, max_length) if  max_length > 1 else 1
 
         # escolher indice inicial de genes entre ind 0 e len-tamanho de cima
-        g1_ind = random.randint(0, len(p1.genes) - size + 1)
-        g2_ind = random.randint(0, len(p2.genes) - size + 1)
+        g1_ind = rng.integers(0, len(p1.genes) - size + 1)
+        g2_ind = rng.integers(0, len(p2.genes) - size + 1)
 
         # fazer a troca
-        g1_genes = p1.genes[g1_ind:g1_ind + size]
-        g2_genes = p2.genes[g2_ind:g2_ind + size]
-
-        g1_drones = [gene.drone_id for gene in g1_genes]
-        g2_drones = [gene.drone_id for gene in g2_genes]
-
-        for i in range(g1_ind, g1_ind + size):
-            p1.genes[i].drone_id = g2_drones[i - g1_ind]
+        g1_drones = p1.genes.drone[g1_ind:g1_ind + size]
+        g2_drones = p2.genes.drone[g2_ind:g2_ind + size]
 
-        for i in range(g2_ind, g2_ind + size):
-            p2.genes[i].drone_id = g1_drones[i - g2_ind]
+        touched = set(g1_drones.tolist()) | set(g2_drones.tolist())
+        p1.set_genes(p1.genes.set_drones(slice(g1_ind, g1_ind + size), g2_drones), touched)
+        p2.set_genes(p2.genes.set_drones(slice(g2_ind, g2_ind + size), g1_drones), touched)
 
         # To switch genes instead of drones
         # p1.genes[g1_ind:g1_ind+size] = g2_genes
@@ -98,98 +127,287 @@ def crossover(p1: Chromosome, p2: Chromosome, r_cross: float) -> list[Chromosome
     return [p1, p2]
 
 
-def mutation(c: Chromosome, r_mut) -> Chromosome:
+def mutation(c: Chromosome, r_mut, rng: np.random.Generator) -> Chromosome:
     """
     Mutates a chromosome with a given rate
 
     :param c: chromosome to be mutated
     :param r_mut: mutation rate
+    :param rng: random generator of the mutation
     :return: mutated chromosome
     """
-    if random.random() <= r_mut:
-        new_c = c.mutate()
+    if rng.random() <= r_mut:
+        new_c = c.mutate(rng)
         return new_c
     return c
 
 
-def genetic_algorithm(n_iter, n_pop, r_cross, r_mut):
+def next_generation(pop: list[Chromosome], scores: list[float], r_cross, r_mut, rng: np.random.Generator,
+                    executor: concurrent.futures.Executor = None) -> tuple[list[Chromosome], list[float]]:
+    """
+    Creates the next generation of a population with selection, crossover and mutation. The children with a
+    positive score replace the population, the remaining places are filled with random ancestors
+
+    :param pop: sample population (chromosomes)
+    :param scores: list with scores (evaluation function)
+    :param r_cross: crossover rate [0.0, 1.0)
+    :param r_mut: mutation rate [0.0, 1.0)
+    :param rng: random generator of the selection, crossover and mutation
+    :param executor: pool of processes evaluating the children, None evaluates them here
+    :return: the next generation and its scores
+    """
+    n_pop = len(pop)
+    # select parents
+    selected = [selection(pop, scores, rng) for _ in range(n_pop)]
+    # create the next generation
+    children = list()
+    for i in range(0, n_pop, 2):
+        # get selected parents in pairs
+        p1, p2 = selected[i], selected[i + 1]
+        # crossover and mutation
+        for c in crossover(p1.copy(), p2.copy(), r_cross, rng):
+            # mutation
+            new_c = mutation(c, r_mut, rng)
+            # store for next generation
+            children.append(new_c)
+    # replace population
+
+    children_scores = evaluate_population(children, executor)
+    survivors = [i for i, score in enumerate(children_scores) if score > 0]
+    ancestors = rng.choice(n_pop, size=(n_pop-len(survivors)))
+    pop = [children[i] for i in survivors] + [pop[i] for i in ancestors]
+    scores = [children_scores[i] for i in survivors] + [scores[i] for i in ancestors]
+    return pop, scores
+
+
+def genetic_algorithm(problem: Problem, n_iter, n_pop, r_cross, r_mut, workers: int = 1, plot: bool = True,
+                      budget: Budget = None, progress: ProgressSink = None, rng: np.random.Generator = None):
     """
     Genetic Algorithm, with a given number of generations, a size for the initial population and the mutation
     and crossover rates
 
+    :param problem: problem to solve
     :param n_iter: number of generations for the algorithm
     :param n_pop: number of individuals for the initial population
     :param r_cross: crossover rate [0.0, 1.0)
     :param r_mut: mutation rate [0.0, 1.0)
-    :return: best individual among every generation
+    :param workers: number of processes building and evaluating the individuals, 1 runs everything in this process
+    and None uses every core
+    :param plot: flag to display a plot of the data collected
+    :param budget: time limit and checkpoints of the run (see Budget), None to only stop after the generations
+    :param progress: sink receiving the best and mean scores of each generation (see ProgressSink)
+    :param rng: random generator of the algorithm, None uses a new one with a random seed
+    :return: best individual by the official score (see objects.simulator.official_rank) between the best one of
+    every generation and the last population, and its score
     """
+    rng = np.random.default_rng(rng)
+    with par.process_pool(problem, workers) if workers != 1 else contextlib.nullcontext() as executor:
+        return _genetic_algorithm(problem, n_iter, n_pop, r_cross, r_mut, rng, executor, plot, budget, progress)
 
-    # initial population of random bitstring
-    pop = create_population(n_pop)
-    # keep track of best solution
-    best, best_eval = best_individual(pop)
 
-    data = {"generation": [], "mean": [], "best": []}
-    scores = []
+def _genetic_algorithm(problem: Problem, n_iter, n_pop, r_cross, r_mut, rng: np.random.Generator,
+                       executor: concurrent.futures.Executor = None, plot: bool = True, budget: Budget = None,
+                       progress: ProgressSink = None):
+    """
+    Genetic Algorithm (see genetic_algorithm)
+
+    :param problem: problem to solve
+    :param n_iter: number of generations for the algorithm
+    :param n_pop: number of individuals for the initial population
+    :param r_cross: crossover rate [0.0, 1.0)
+    :param r_mut: mutation rate [0.0, 1.0)
+    :param rng: random generator of the algorithm
+    :param executor: pool of processes building and evaluating the individuals, None runs everything here
+    :param plot: flag to display a plot of the data collected
+    :param budget: time limit and checkpoints of the run (see Budget)
+    :param progress: sink receiving the best and mean scores of each generation (see ProgressSink)
+    :return: best individual by the official score (see objects.simulator.official_rank) between the best one of
+    every generation and the last population, and its score
+    """
+
+    state = budget.load('genetic_algorithm', rng) if budget is not None else None
+    if state is None:
+        # initial population of random bitstring
+        start = perf_counter()
+        pop = create_population(problem, n_pop, rng, executor)
+        # keep track of best solution
+        scores = evaluate_population(pop, executor)
+        best_eval = max(scores)
+        best = pop[scores.index(best_eval)]
+        first = 0
+        if profiling.active is not None:
+            profiling.active.add_time('genetic_algorithm.population', perf_counter() - start)
+    else:
+        pop, scores = [Chromosome(problem, GeneTable.decode(genes)) for genes in state['population']], state['scores']
+        for c, score, penalty in zip(pop, scores, state['penalties']):
+            c.score, c.penalty = score + penalty, penalty
+        best, best_eval = Chromosome(problem, GeneTable.decode(state['best'])), state['best_eval']
+        first = state['generation']
+
+    def search_state(generation: int) -> dict:
+        return {'solver': 'genetic_algorithm', 'generation': generation, 'population': [c.genes.encode() for c in pop],
+                'scores': list(scores), 'penalties': [c.penalty for c in pop], 'best': best.genes.encode(),
+                'best_eval': best_eval}
+
+    sample = SampleSink() if plot else None
+    sink = MultiSink(progress, sample) if plot else progress
 
     # enumerate generations
-    for gen in range(n_iter):
-        # evaluate all candidates in the population
-        scores = [c.update_internal() for c in pop]
-        print("GEN ", gen + 1, "OF ", n_iter, "| MAX SCORE: ", str(max(scores)), " MEAN: ", mean(scores))
+    last = n_iter
+    for gen in range(first, n_iter):
+        if budget is not None and budget.tick(best, lambda: search_state(gen), rng):
+            last = gen
+            break
+        start = perf_counter()
+        # every candidate in the population was already evaluated
+        mean_score = mean(scores)
+        print("GEN ", gen + 1, "OF ", n_iter, "| MAX SCORE: ", str(max(scores)), " MEAN: ", mean_score)
         # check for new best solution
         for i in range(n_pop):
             if scores[i] > best_eval and not pop[i].penalty:
                 best, best_eval = pop[i], scores[i]
                 print(">%d, new best f(%s) = %.3f" % (gen, repr(pop[i]), scores[i]))
 
-        data['generation'].append(gen)
-        data['best'].append(best_eval)
-        data['mean'].append(mean(scores))
+        if sink is not None:
+            sink.record({'generation': gen, 'best': best_eval, 'mean': mean_score})
+
+        pop, scores = next_generation(pop, scores, r_cross, r_mut, rng, executor)
+        if profiling.active is not None:
+            # the duration of each generation is kept, to see how it changes along the run
+            profiling.active.add_time('genetic_algorithm.generation', perf_counter() - start, keep=True)
+
+    if sink is not None:
+        sink.record({'generation': last, 'best': best_eval, 'mean': mean(scores)})
+
+    if budget is not None:
+        budget.save(best, search_state(last), rng)
 
-        # select parents
-        selected = [selection(pop, scores) for _ in range(n_pop)]
-        # create the next generation
-        children = list()
-        for i in range(0, n_pop, 2):
-            # get selected parents in pairs
-            p1, p2 = selected[i], selected[i + 1]
-            # crossover and mutation
-            for c in crossover(deepcopy(p1), deepcopy(p2), r_cross):
-                # mutation
-                new_c = mutation(c, r_mut)
-                # store for next generation
-                children.append(new_c)
-        # replace population
+    if plot:
+        import search.reporting as report
+        report.plot_genetic_algorithm(sample.data())
+        report.show()
 
-        children = list(filter(lambda x: x.update_internal() > 0, children))
-        ancestors = random.choice(range(n_pop), size=(n_pop-len(children)))
-        pop = children + [pop[i] for i in ancestors]
+    # the final candidates are ranked by the official score
+    best = best_official([best] + pop)
+    return best.clean(), best.update_internal()
 
-    data['generation'].append(n_iter)
-    data['best'].append(best_eval)
-    data['mean'].append(mean(scores))
 
-    df = pd.DataFrame(data=data)
+def migration_targets(islands: int, topology: str = "ring") -> list[list[int]]:
+    """
+    Islands receiving the migrants of each island
+
+    :param islands: number of islands
+    :param topology: "ring", each island sends to the next one, or "all", each island sends to every other island
+    :return: list with the targets of each island
+    """
+    if topology == "ring":
+        return [[(i + 1) % islands] if islands > 1 else [] for i in range(islands)]
+    if topology == "all":
+        return [[j for j in range(islands) if j != i] for i in range(islands)]
+    raise ValueError("Unknown migration topology: " + str(topology))
 
-    fig, ax = plt.subplots()
 
-    df.plot(x='generation', y='best', ax=ax)
-    df.plot(x='generation', y='mean', ax=ax)
+def island_genetic_algorithm(problem: Problem, n_iter, n_pop, r_cross, r_mut, islands: int = None, interval: int = 10,
+                             migrants: int = 2, topology: str = "ring", rng: np.random.Generator = None):
+    """
+    Island model of the Genetic Algorithm: each island evolves its own population on a separate process, and every
+    few generations the best individuals of each island migrate to its neighbours, replacing their worst ones
+
+    :param problem: problem to solve
+    :param n_iter: number of generations for the algorithm
+    :param n_pop: number of individuals of the population of each island
+    :param r_cross: crossover rate [0.0, 1.0)
+    :param r_mut: mutation rate [0.0, 1.0)
+    :param islands: number of islands (processes), defaults to the number of cores
+    :param interval: number of generations between migrations (0 disables migration)
+    :param migrants: number of individuals sent by each island on a migration
+    :param topology: "ring" or "all" (see migration_targets)
+    :param rng: random generator the generators of the islands are derived from, None uses a new one with a random
+    seed
+    :return: best individual among every island by the official score (see objects.simulator.official_rank), its
+    score and the best score of each island
+    """
+    islands = islands or os.cpu_count() or 1
+    targets = migration_targets(islands, topology)
+    sources = [sum(i in island_targets for island_targets in targets) for i in range(islands)]
+
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(islands)]
+    results = context.Queue()
+    generators = par.spawn(np.random.default_rng(rng), islands)
+
+    processes = [context.Process(target=_island, args=(i, generators[i], problem, n_iter, n_pop, r_cross, r_mut,
+                                                       interval, migrants, inboxes, targets[i], sources[i], results))
+                 for i in range(islands)]
+    for process in processes:
+        process.start()
+    island_results = par.collect(results, processes, islands)
+    island_results.sort(key=lambda result: result[0])
+
+    island_bests = [score for _, score, _ in island_results]
+    for i, score in enumerate(island_bests):
+        print("ISLAND ", i, "| BEST SCORE: ", score)
+
+    # the best individuals of the islands are ranked by the official score
+    best = best_official([Chromosome(problem, GeneTable.decode(encoded)) for _, _, encoded in island_results])
+    best_eval = best.update_internal()
+    print("GLOBAL BEST SCORE: ", best_eval)
+    return best, best_eval, island_bests
+
+
+def _island(island: int, rng: np.random.Generator, problem: Problem, n_iter, n_pop, r_cross, r_mut, interval: int,
+            migrants: int, inboxes: list, targets: list[int], sources: int, results) -> None:
+    """
+    Evolves the population of an island (see island_genetic_algorithm), runs on a separate process
+
+    :param island: index of the island
+    :param rng: random generator of the island
+    :param problem: problem to solve
+    :param n_iter: number of generations for the algorithm
+    :param n_pop: number of individuals of the population
+    :param r_cross: crossover rate [0.0, 1.0)
+    :param r_mut: mutation rate [0.0, 1.0)
+    :param interval: number of generations between migrations (0 disables migration)
+    :param migrants: number of individuals sent on a migration
+    :param inboxes: queues receiving the migrants of each island
+    :param targets: islands receiving the migrants of this island
+    :param sources: number of islands sending migrants to this island
+    :param results: queue receiving the index, best score and best individual of each island
+    """
+    pop = create_population(problem, n_pop, rng)
+    scores = evaluate_population(pop)
+    best_eval = max(scores)
+    best = pop[scores.index(best_eval)]
+    early = []  # migrants of later migrations, sent by islands that are ahead of this one
+
+    for gen in range(n_iter):
+        for i in range(n_pop):
+            if scores[i] > best_eval and not pop[i].penalty:
+                best, best_eval = pop[i], scores[i]
+
+        if interval and gen % interval == interval - 1:
+            migration = gen // interval
+            # a single write per line, the islands share the output
+            print("ISLAND %d | GEN %d OF %d | BEST SCORE: %s\n" % (island, gen + 1, n_iter, best_eval), end="",
+                  flush=True)
 
-    best_score = max(data['best'])
-    xpos = data['best'].index(best_score)
-    xmax = data['generation'][xpos]
+            ranking = sorted(range(n_pop), key=lambda i: -scores[i])
+            emigrants = [pop[i].genes.encode() for i in ranking[:migrants]]
+            for target in targets:
+                inboxes[target].put((migration, island, emigrants))
 
-    ax.annotate(str(best_score) + "(generation = " + str(xmax) + ")", xy=(xmax, best_score), xytext=(xmax, best_score + 5),
-                arrowprops=dict(facecolor='black', shrink=0.05),
-                )
+            arrived = [message for message in early if message[0] == migration]
+            early = [message for message in early if message[0] != migration]
+            while len(arrived) < sources:
+                message = inboxes[island].get()
+                (arrived if message[0] == migration else early).append(message)
+            immigrants = [encoded for _, _, batch in sorted(arrived, key=lambda m: m[1]) for encoded in batch]
 
-    ax.set_ylim(min(data['mean']) - 10, 110)
-    fig.set_size_inches(18.5, 11.5)
-    ax.set_title('Genetic Algorithms')
-    ax.set_ylabel('Score')
+            # the immigrants replace the worst individuals
+            for i, encoded in zip(reversed(ranking), immigrants):
+                pop[i] = Chromosome(problem, GeneTable.decode(encoded))
+                scores[i] = pop[i].update_internal()
 
-    plt.show()
+        pop, scores = next_generation(pop, scores, r_cross, r_mut, rng)
 
-    return best.clean(), best_eval
+    results.put((island, best_eval, best.clean().genes.encode()))
@@ -1,29 +1,139 @@
-from objects.primitives import *
+from copy import deepcopy
 
+import numpy as np
 
-def greedy_solution(use_best: bool = True):
+from objects.primitives import *
+import objects.profiling as profiling
+from objects.spatial import SpatialIndex
+
+
+class ShipmentScorer:
+    def __init__(self, problem: Problem, orders: list[Order], stock: StockIndex):
+        """
+        Scores the shipments of every Order and WareHouse at once. The products left on each Order are mirrored in
+        arrays, along with the products each shipment would carry, and they must be updated with every executed
+        shipment. The stock of the warehouses is read from the StockIndex shared with the shipments
+        :param problem: problem solved
+        :param orders: list of orders to be delivered
+        :param stock: stock left on the problem's warehouses
+        """
+        self.problem = problem
+        self.orders = orders
+        self.warehouses = problem.warehouses
+        self.stock = stock
+        self.weights = problem.weights
+
+        # the items of each order are sorted by decreasing weight, the order in which Shipment.create loads them
+        items = [sorted(order.products.items(), key=lambda p: -problem.get_product(p[0]).weight) for order in orders]
+        width = max((len(order_items) for order_items in items), default=0)
+        self.item_product = np.zeros((len(orders), width), dtype=np.int64)
+        self.item_quantity = np.zeros((len(orders), width), dtype=np.int64)  # padding items have quantity 0
+        self.item_column: list[dict[int, int]] = []
+        for i, order_items in enumerate(items):
+            for j, (product_id, quantity) in enumerate(order_items):
+                self.item_product[i, j] = product_id
+                self.item_quantity[i, j] = quantity
+            self.item_column.append({product_id: j for j, (product_id, _) in enumerate(order_items)})
+
+        self.order_weight = np.array([order.product_weight for order in orders], dtype=np.float64)
+        self.warehouse_nodes = np.arange(len(self.warehouses), dtype=np.int64)  # warehouses come first
+        order_nodes = np.array([problem.node_index(order) for order in orders], dtype=np.int64)
+        self.order_distance = problem.distances()[np.ix_(order_nodes, self.warehouse_nodes)]
+        self.positions = {id(order): i for i, order in enumerate(orders)}
+
+        # weight and number of distinct products of the shipment of each order (rows) from each warehouse (columns)
+        self.carried, self.n_products = self.__load(slice(None), slice(None))
+
+    def best(self, drone_path: DronePath) -> Union[tuple[Order, Warehouse], None]:
+        """
+        Finds the Order and WareHouse of the best shipment for a drone, the same one found by building a Shipment
+        for every incomplete order and every warehouse (ties are won by the first order, then the first warehouse)
+
+        :param drone_path: the target drone's path
+        :return: the order and warehouse of the best shipment, None if no shipment fits in the remaining turns
+        """
+        turns = self.problem.distances()[drone_path.current_node, self.warehouse_nodes][None, :] + \
+            self.order_distance + self.n_products * 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = self.carried / self.order_weight[:, None] / turns
+
+        feasible = (self.n_products > 0) & (drone_path.turns + turns <= self.problem.turns) & (score > 0)
+        if not feasible.any():
+            return None
+
+        row, column = np.unravel_index(np.argmax(np.where(feasible, score, -np.inf)), score.shape)
+        return self.orders[row], self.warehouses[column]
+
+    def update(self, shipment: Shipment) -> None:
+        """
+        Removes the products of an executed shipment from the order arrays (its warehouse stock is already reserved
+        on the StockIndex), only the shipments of the same order or warehouse are loaded again
+        :param shipment: the executed shipment
+        """
+        order, warehouse = self.positions[id(shipment.order)], shipment.warehouse.id
+        for product_id, quantity in shipment.products.items():
+            self.item_quantity[order, self.item_column[order][product_id]] -= quantity
+
+        self.carried[order, :], self.n_products[order, :] = self.__load([order], slice(None))
+        self.carried[:, [warehouse]], self.n_products[:, [warehouse]] = self.__load(slice(None), [warehouse])
+
+    def __load(self, orders, warehouses) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Greedy knapsack of Shipment.create for some orders and warehouses
+
+        :param orders: positions of the orders (rows)
+        :param warehouses: positions of the warehouses (columns)
+        :return: weight carried and number of distinct products of each shipment
+        """
+        products = self.item_product[orders]
+        quantities = self.item_quantity[orders]
+        stock = self.stock.quantities[warehouses]
+
+        payload = np.full((len(products), len(stock)), self.problem.payload, dtype=np.int64)
+        carried = np.zeros_like(payload)
+        n_products = np.zeros_like(payload)
+        for j in range(products.shape[1]):
+            weight = self.weights[products[:, j]][:, None]
+            units = np.minimum(np.minimum(quantities[:, j, None], stock[:, products[:, j]].T), payload // weight)
+            payload -= units * weight
+            carried += units * weight
+            n_products += units > 0
+        return carried, n_products
+
+
+def greedy_solution(problem: Problem, use_best: bool = True, rng: np.random.Generator = None):
     """
     Find a solution using a greedy algorithm, if the flag use_best is enabled the algorithm will use
     a slight less efficient method to calculate the solution (random), this is significantly faster
     and is used to create the initial population for the genetic algorithm
 
+    :param problem: problem to solve
     :param use_best: flag to indicate if the method to be used is the extra greedy or the random
+    :param rng: random generator of the random method, None uses a new one with a random seed
     :return: a solution for the problem
     """
-    orders, warehouses = deepcopy(Problem.orders), deepcopy(Problem.warehouses)
+    if profiling.active is None:
+        orders = deepcopy(problem.orders)
+    else:
+        with profiling.active.timer('deepcopy'):
+            orders = deepcopy(problem.orders)
+    stock = StockIndex(problem.stock)
 
     # initialize drone paths
     drone_path_list = {}
-    for i in range(Problem.drones):
-        drone_path_list[i] = DronePath(i, Problem.warehouses[0].position)
+    for i in range(problem.drones):
+        drone_path_list[i] = DronePath(problem, i)
 
-    chromosome = Chromosome(None, drone_path_list)
+    chromosome = Chromosome(problem, None, drone_path_list)
+    scorer = ShipmentScorer(problem, orders, stock) if use_best else None
+    index = None if use_best else SpatialIndex(problem, stock)
+    rng = None if use_best else np.random.default_rng(rng)
 
     orders_done = 0
     while not all_orders_complete(orders):
         for i, drone_path in drone_path_list.items():
-            temp = best_shipment(drone_path, chromosome, orders, warehouses) if use_best else \
-                   one_shipment(drone_path, chromosome, orders, warehouses)
+            temp = best_shipment(drone_path, chromosome, scorer) if use_best else \
+                   one_shipment(drone_path, chromosome, orders, index, rng)
             if temp < 0:
                 break
             else:
@@ -32,52 +142,47 @@ def greedy_solution(use_best: bool = True):
     return chromosome
 
 
-def best_shipment(drone_path: DronePath, chromosome: Chromosome, orders: list[Order], warehouses: list[Warehouse]) -> int:
+def best_shipment(drone_path: DronePath, chromosome: Chromosome, scorer: ShipmentScorer) -> int:
     """
     Calculates the best shipment for a drone
 
     :param drone_path: the target drone's path
     :param chromosome: the target chromosome
-    :param orders: a list of problem's orders
-    :param warehouses: a list of problem's warehouses
+    :param scorer: scorer holding the problem's orders and the stock of the warehouses
     :return: the number of completed orders for this shipment
     """
 
-    best = 0
-    best_shipment = None
-
-    for order in orders:
-        if not order.complete():
-            for warehouse in warehouses:
-                shipment = Shipment(drone_path, order, warehouse)
-                if shipment.has_products() and drone_path.turns + shipment.turns <= Problem.turns and shipment.score > best:
-                    best, best_shipment = shipment.score, shipment
-    if best_shipment is None:
+    best = scorer.best(drone_path)
+    if best is None:
         return -1
 
+    best_shipment = Shipment(chromosome.problem, drone_path, *best, scorer.stock)
     order_complete = best_shipment.execute(chromosome)
+    scorer.update(best_shipment)
     # print("Sent Shipment with Drone", drone_path.drone_id, ", order", best_shipment.order.id)
     return order_complete
 
 
-def one_shipment(drone_path: DronePath, chromosome: Chromosome, orders: list[Order], warehouses: list[Warehouse]) -> int:
+def one_shipment(drone_path: DronePath, chromosome: Chromosome, orders: list[Order], index: SpatialIndex,
+                 rng: np.random.Generator) -> int:
     """
     Essentially the same as the best_shipment method but the selection is done with randomness
 
     :param drone_path: the target drone's path
     :param chromosome: the target chromosome
     :param orders: a list of problem's orders
-    :param warehouses: a list of problem's warehouses
+    :param index: spatial index of the problem's warehouses and their stock
+    :param rng: random generator choosing the order and the warehouse
     :return: the number of completed orders for this shipment
     """
 
     not_completed = [order for order in orders if not order.complete()]
     if not not_completed:
         return -1
-    order = random.choice(not_completed)
-    available_wh = [wh for wh in warehouses if wh.has_any_product(order.products)]
-    warehouse = random.choice(available_wh)
-    shipment = Shipment(drone_path, order, warehouse)
+    order = not_completed[rng.integers(len(not_completed))]
+    available_wh = index.warehouses_with_any(order.products)
+    warehouse = available_wh[rng.integers(len(available_wh))]
+    shipment = Shipment(chromosome.problem, drone_path, order, warehouse, index.stock)
     order_complete = shipment.execute(chromosome)
     # print("Sent Shipment with Drone", drone_path.drone_id, ", order", shipment.order.id)
     return order_complete
@@ -1,9 +1,15 @@
+import multiprocessing
+import os
 from math import exp, log
-from random import randint
-import pandas as pd
-import matplotlib.pyplot as plt
 
-from objects.primitives import Chromosome
+import numpy as np
+from objects.primitives import Chromosome, GeneTable, Problem
+from objects.routes import ROUTE_MOVES, RouteIndex
+from objects.simulator import best_official
+import objects.profiling as profiling
+from search.budget import Budget
+from search.progress import MultiSink, ProgressSink, SampleSink
+import search.parallel as par
 
 
 class CoolingFunctions:
@@ -20,112 +26,181 @@ class CoolingFunctions:
     def quadratic(t0, iteration, _): return t0 / (1 + iteration ** 2)
 
 
-def plot_simulated_annealing(data: dict) -> None:
-    """
-    Plots the data acquired on the simulated annealing algorithm
-
-    :param data: data containing iterations, best values and temperatures
-    """
-
-    df = pd.DataFrame(data=data)
-
-    fig, ax = plt.subplots()
-
-    df.plot(x='iteration', y='current', ax=ax)
-    df.plot(x='iteration', y='best', ax=ax)
-    df.plot(x='iteration', y='temperature', ax=ax, secondary_y=True)
-
-    best_score = max(data['best'])
-    xpos = data['best'].index(best_score)
-    xmax = data['iteration'][xpos]
-
-    ax.annotate(str(best_score) + " (max)", xy=(xmax, best_score), xytext=(xmax, best_score + 5),
-                arrowprops=dict(facecolor='black', shrink=0.05),
-                )
-
-    ax.set_ylim(min(data['current']) - 10, 110)
-    fig.set_size_inches(18.5, 10.5)
-    ax.set_title('Simulated Annealing')
-
-
-def hill_climbing(initial_input: Chromosome, iterations: int = 100) -> Chromosome:
+def hill_climbing(initial_input: Chromosome, iterations: int = 100, plot: bool = True,
+                  budget: Budget = None, progress: ProgressSink = None, rng: np.random.Generator = None) -> Chromosome:
     """
     Hill Climbing Heuristic for a solution
 
     :param initial_input: the initial solution to be optimized
     :param iterations: number of max iterations for the algorithm
+    :param plot: flag to display a plot of the data collected
+    :param budget: time limit and checkpoints of the run (see Budget), None to only stop after the iterations
+    :param progress: sink receiving the score of each iteration (see ProgressSink)
+    :param rng: random generator of the mutations, None uses a new one with a random seed
     :return: the optimized solution
     """
 
+    rng = np.random.default_rng(rng)
     chromosome = initial_input
     score = chromosome.update_internal()
-
-    data = {'value': [score], 'iteration': [0]}
-
-    for i in range(1, iterations + 1):
-        candidate = chromosome.mutate()
+    first = 1
+
+    state = budget.load('hill_climbing', rng) if budget is not None else None
+    if state is not None:
+        chromosome = Chromosome(chromosome.problem, GeneTable.decode(state['current']))
+        score, first = chromosome.update_internal(), state['iteration'] + 1
+
+    sample = SampleSink() if plot else None
+    sink = MultiSink(progress, sample) if plot else progress
+    done = first - 1
+    if sink is not None:
+        sink.record({'iteration': done, 'value': score})
+
+    for i in range(first, iterations + 1):
+        if budget is not None and budget.tick(chromosome, lambda: _hill_climbing_state(chromosome, i - 1), rng):
+            break
+        candidate = chromosome.mutate(rng)
         candidate_score = candidate.update_internal()
-        if candidate_score >= score:
+        accept = candidate_score >= score
+        if accept:
             chromosome, score = candidate, candidate_score
+        profiling.accepted('hill_climbing', accept)
 
-        data['value'].append(score)
-        data['iteration'].append(i)
+        done = i
+        if sink is not None:
+            sink.record({'iteration': i, 'value': score})
 
-    plt.plot(data['iteration'], data['value'])
-    plt.xlabel("Iteration")
-    plt.ylabel("Value")
-    plt.title("Hill Climbing")
+    if budget is not None:
+        budget.save(chromosome, _hill_climbing_state(chromosome, done), rng)
 
-    best_score = max(data['value'])
-    xpos = data['value'].index(best_score)
-    xmax = data['iteration'][xpos]
+    if plot:
+        import search.reporting as report
+        report.plot_hill_climbing(sample.data())
+        report.show()
+
+    return chromosome.clean()
 
-    plt.gca().annotate(str(best_score) + " (max)", xy=(xmax, best_score), xytext=(xmax, best_score + 5),
-                       arrowprops=dict(facecolor='black', shrink=0.05),
-                       )
 
-    plt.gca().set_ylim(min(data['value']) - 10, 110)
+def _hill_climbing_state(chromosome: Chromosome, iteration: int, solver: str = 'hill_climbing') -> dict:
+    """
+    Checkpoint of the hill climbing and of the local search (see Budget.save)
 
-    fig = plt.gcf()
-    fig.set_size_inches(15.5, 10.5)
+    :param chromosome: current solution
+    :param iteration: last iteration done
+    :param solver: name of the search
+    :return: state of the search
+    """
+    return {'solver': solver, 'iteration': iteration, 'current': chromosome.genes.encode()}
+
+
+def local_search(initial_input: Chromosome, iterations: int = 1000, span: int = 8, budget: Budget = None,
+                 progress: ProgressSink = None, rng: np.random.Generator = None) -> Chromosome:
+    """
+    Hill Climbing on the routes of the drones: 2-opt and or-opt of the trips of a drone, relocation and swap of trips
+    between drones (see objects.routes). The change made by each move is estimated first from the index of the
+    trips, in a few operations, and only the moves estimated to improve the routes are evaluated, rebuilding the
+    paths of the drones they alter. The estimate is a screen and not the change of the score (see RouteIndex.delta),
+    an evaluated move is kept if the score doesn't get worse
 
-    plt.show()
+    :param initial_input: the initial solution to be optimized
+    :param iterations: number of moves tried, evaluated or not
+    :param span: maximum number of trips reversed by the 2-opt moves, and moved over by the or-opt moves
+    :param budget: time limit and checkpoints of the run (see Budget), None to only stop after the iterations
+    :param progress: sink receiving the score of each iteration (see ProgressSink)
+    :param rng: random generator of the moves, None uses a new one with a random seed
+    :return: the optimized solution
+    """
+
+    rng = np.random.default_rng(rng)
+    chromosome = initial_input
+    score = chromosome.update_internal()
+    first = 1
+
+    state = budget.load('local_search', rng) if budget is not None else None
+    if state is not None:
+        chromosome = Chromosome(chromosome.problem, GeneTable.decode(state['current']))
+        score, first = chromosome.update_internal(), state['iteration'] + 1
+
+    chromosome = chromosome.copy()  # the index replaces the table of genes of the chromosome, it alters it in place
+    index = RouteIndex(chromosome)
+    done = first - 1
+    if progress is not None:
+        progress.record({'iteration': done, 'value': score})
+
+    for i in range(first, iterations + 1):
+        if budget is not None and budget.tick(
+                chromosome, lambda: _hill_climbing_state(chromosome, i - 1, 'local_search'), rng):
+            break
+        move = ROUTE_MOVES[rng.integers(0, len(ROUTE_MOVES))](index, rng, span)
+        if move is None or index.delta(move) >= 0:
+            if profiling.active is not None:
+                profiling.active.count('local_search.screened')
+        else:
+            # the candidate shares the table the index alters in place, the move is undone if it is rejected
+            candidate = chromosome.copy()
+            candidate.touch(index.apply(move))
+            candidate_score = candidate.update_internal()
+            accept = candidate_score >= score
+            if accept:
+                chromosome, score = candidate, candidate_score
+            else:
+                index.revert()
+            profiling.accepted('local_search', accept)
+
+        done = i
+        if progress is not None:
+            progress.record({'iteration': i, 'value': score})
+
+    if budget is not None:
+        budget.save(chromosome, _hill_climbing_state(chromosome, done, 'local_search'), rng)
 
     return chromosome.clean()
 
 
-def _simulated_annealing(initial_value: Chromosome, cooling_function, iterations: int = 50, temp: int = 100,
-                         cumulative: int = 0, data=None):
+def _simulated_annealing(initial_value: Chromosome, cooling_function, rng: np.random.Generator, iterations: int = 50,
+                         temp: int = 100, cumulative: int = 0, progress: ProgressSink = None, budget: Budget = None,
+                         checkpoint: dict = None, state: dict = None):
     """
-    Simulated Annealing private method, the algorithm is implemented here, and it will collect the data to
-    later display the plot.
+    Simulated Annealing private method, the algorithm is implemented here, and it will send the progress of each
+    iteration to a sink, to later display the plot.
 
     :param initial_value: initial solution to optimize
     :param cooling_function: cooling function to be used
+    :param rng: random generator of the mutations and of the acceptance
     :param iterations: max iterations for the algorithm
     :param temp: initial temperature
     :param cumulative: cumulative iterations (used for iterative simulated annealing)
-    :param data: data to be collected
+    :param progress: sink receiving the scores and temperature of each iteration (see ProgressSink)
+    :param budget: time limit and checkpoints of the run (see Budget)
+    :param checkpoint: values identifying the run in its checkpoints, including the name of the search (solver)
+    :param state: checkpoint to resume the run from (see Budget.load), None to start it from initial_value
     :return: the optimized solution
     """
 
-    if data is None:
-        data = {'best': [], 'current': [], 'iteration': [], 'temperature': []}
-
     best = initial_value
     best_score = best.update_internal()
-
     current, current_score = best, best_score
+    first = 1
+
+    if state is not None:
+        current = Chromosome(initial_value.problem, GeneTable.decode(state['current']))
+        best = Chromosome(initial_value.problem, GeneTable.decode(state['best']))
+        current_score, best_score, first = current.update_internal(), best.update_internal(), state['iteration'] + 1
+
+    def search_state(iteration: int) -> dict:
+        return {**checkpoint, 'iteration': iteration, 'current': current.genes.encode(), 'best': best.genes.encode()}
 
-    data['best'].append(best_score)
-    data['current'].append(current_score)
-    data['iteration'].append(cumulative)
-    data['temperature'].append(temp)
+    done = first - 1
+    if progress is not None:
+        progress.record({'iteration': cumulative + done, 'best': best_score, 'current': current_score,
+                         'temperature': temp})
 
     # print("start score:", current_score)
 
-    for i in range(1, iterations + 1):
-        candidate = current.mutate()
+    for i in range(first, iterations + 1):
+        if budget is not None and budget.tick(best, lambda: search_state(i - 1), rng):
+            break
+        candidate = current.mutate(rng)
         candidate_score = candidate.update_internal()
         # print("Candidate score:", candidate_score)
         if candidate_score > best_score:
@@ -138,18 +213,25 @@ def _simulated_annealing(initial_value: Chromosome, cooling_function, iterations
         except OverflowError:
             metropolis = float('inf')
 
-        if (diff < 0 or randint(0, 1) < metropolis) and candidate_score > 0:
+        accept = (diff < 0 or rng.integers(0, 2) < metropolis) and candidate_score > 0
+        if accept:
             current, current_score = candidate, candidate_score
+        profiling.accepted('simulated_annealing', accept)
 
-        data['best'].append(best_score)
-        data['current'].append(current_score)
-        data['iteration'].append(cumulative + i)
-        data['temperature'].append(t)
+        done = i
+        if progress is not None:
+            progress.record({'iteration': cumulative + i, 'best': best_score, 'current': current_score,
+                             'temperature': t})
+
+    if budget is not None:
+        budget.save(best, search_state(done), rng)
 
     return best.clean()
 
 
-def simulated_annealing(initial_value: Chromosome, cooling_function, iterations, temp: int = 100):
+def simulated_annealing(initial_value: Chromosome, cooling_function, iterations, temp: int = 100,
+                        plot: bool = True, budget: Budget = None, progress: ProgressSink = None,
+                        rng: np.random.Generator = None):
     """
     Public method for the simulated annealing, it will run the algorithm and display a plot for the data collected
     afterwards
@@ -158,18 +240,29 @@ def simulated_annealing(initial_value: Chromosome, cooling_function, iterations,
     :param cooling_function: cooling function to be used
     :param iterations: max iterations for the algorithm
     :param temp: initial temperature
+    :param plot: flag to display a plot of the data collected
+    :param budget: time limit and checkpoints of the run (see Budget), None to only stop after the iterations
+    :param progress: sink receiving the scores and temperature of each iteration (see ProgressSink)
+    :param rng: random generator of the mutations and of the acceptance, None uses a new one with a random seed
     :return: the optimized solution
     """
 
-    data = {'best': [], 'current': [], 'iteration': [], 'temperature': []}
-    best = _simulated_annealing(initial_value, cooling_function, iterations, temp, data=data)
-    plot_simulated_annealing(data)
-    plt.show()
+    rng = np.random.default_rng(rng)
+    sample = SampleSink() if plot else None
+    state = budget.load('simulated_annealing', rng) if budget is not None else None
+    best = _simulated_annealing(initial_value, cooling_function, rng, iterations, temp,
+                                progress=MultiSink(progress, sample) if plot else progress, budget=budget,
+                                checkpoint={'solver': 'simulated_annealing'}, state=state)
+    if plot:
+        import search.reporting as report
+        report.plot_simulated_annealing(sample.data())
+        report.show()
     return best
 
 
 def iterative_simulated_annealing(initial_input, cooling_function, iterations: int = 3, sa_iterations: int = 100,
-                                  temp: int = 100):
+                                  temp: int = 100, plot: bool = True, budget: Budget = None,
+                                  progress: ProgressSink = None, rng: np.random.Generator = None):
     """
     'Iterative' Simulated Annealing, it will run the simulated annealing algorithm several times, trying to optimize
     the previous best solution
@@ -179,15 +272,109 @@ def iterative_simulated_annealing(initial_input, cooling_function, iterations: i
     :param iterations: max iterations for the algorithm
     :param sa_iterations: max iterations for each run of the simulated annealing
     :param temp: initial temperature
+    :param plot: flag to display a plot of the data collected
+    :param budget: time limit and checkpoints of the run (see Budget), None to only stop after the iterations
+    :param progress: sink receiving the scores and temperature of each iteration of every run (see ProgressSink)
+    :param rng: random generator of the mutations and of the acceptance, None uses a new one with a random seed
     :return: the optimized solution
     """
 
-    data = {'best': [], 'current': [], 'iteration': [], 'temperature': []}
-    for i in range(iterations):
+    rng = np.random.default_rng(rng)
+    sample = SampleSink() if plot else None
+    sink = MultiSink(progress, sample) if plot else progress
+    state = budget.load('iterative_simulated_annealing', rng) if budget is not None else None
+    first = state['run'] if state is not None else 0
+    for i in range(first, iterations):
         cumulative = i * sa_iterations
-        initial_input = _simulated_annealing(initial_input, cooling_function, sa_iterations, temp,
-                                             cumulative=cumulative, data=data)
-
-    plot_simulated_annealing(data)
-    plt.show()
+        initial_input = _simulated_annealing(initial_input, cooling_function, rng, sa_iterations, temp,
+                                             cumulative=cumulative, progress=sink, budget=budget,
+                                             checkpoint={'solver': 'iterative_simulated_annealing', 'run': i},
+                                             state=state if i == first else None)
+        if budget is not None and budget.stopped():
+            break
+
+    if plot:
+        import search.reporting as report
+        report.plot_simulated_annealing(sample.data())
+        report.show()
     return initial_input
+
+
+def parallel_simulated_annealing(initial_input: Chromosome, cooling_functions: list = None, iterations: int = 3,
+                                 sa_iterations: int = 100, temp: int = 100, chains: int = None,
+                                 rng: np.random.Generator = None) -> Chromosome:
+    """
+    Multi-start Simulated Annealing, it will run several chains of the iterative simulated annealing at once, each
+    on a separate process with its own random generator and cooling function. After each run of the simulated annealing
+    the chains wait for each other, and the chains behind the best solution of that run continue from it, so a seeded
+    run gives the same solution whatever the scheduling of the processes
+
+    :param initial_input: initial solution to optimize, shared by every chain
+    :param cooling_functions: cooling functions used by the chains in turn, defaults to every one in CoolingFunctions
+    :param iterations: max iterations (runs of the simulated annealing) for each chain
+    :param sa_iterations: max iterations for each run of the simulated annealing
+    :param temp: initial temperature
+    :param chains: number of chains (processes), defaults to the number of cores
+    :param rng: random generator the generators of the chains are derived from, None uses a new one with a random seed
+    :return: the best solution among every chain, by the official score (see objects.simulator.official_rank)
+    """
+    if cooling_functions is None:
+        cooling_functions = [CoolingFunctions.exponential, CoolingFunctions.linear, CoolingFunctions.quadratic,
+                             CoolingFunctions.logarithmic]
+    chains = chains or os.cpu_count() or 1
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    problem = initial_input.problem
+    encoded = initial_input.genes.encode()
+    generators = par.spawn(np.random.default_rng(rng), chains)
+
+    rounds = par.RoundBest(context, chains)
+    processes = [context.Process(target=_annealing_chain,
+                                 args=(i, generators[i], problem, encoded,
+                                       cooling_functions[i % len(cooling_functions)], iterations, sa_iterations, temp,
+                                       rounds, results))
+                 for i in range(chains)]
+    for process in processes:
+        process.start()
+    chain_results = sorted(par.collect(results, processes, chains), key=lambda result: result[0])
+
+    for i, score, _ in chain_results:
+        print("CHAIN ", i, "| BEST SCORE: ", score)
+
+    # the best solutions of the chains are ranked by the official score
+    best = best_official([Chromosome(problem, GeneTable.decode(encoded)) for _, _, encoded in chain_results])
+    print("GLOBAL BEST SCORE: ", best.update_internal())
+    return best
+
+
+def _annealing_chain(chain: int, rng: np.random.Generator, problem: Problem, encoded, cooling_function, iterations: int,
+                     sa_iterations: int, temp: int, rounds: par.RoundBest, results) -> None:
+    """
+    Chain of the multi-start simulated annealing (see parallel_simulated_annealing), runs on a separate process
+
+    :param chain: index of the chain
+    :param rng: random generator of the chain
+    :param problem: problem to solve
+    :param encoded: encoded genes of the initial solution (see GeneTable.encode)
+    :param cooling_function: cooling function to be used
+    :param iterations: max iterations (runs of the simulated annealing)
+    :param sa_iterations: max iterations for each run of the simulated annealing
+    :param temp: initial temperature
+    :param rounds: best solution of each run of the chains
+    :param results: queue receiving the index, best score and best solution of each chain
+    """
+    current = Chromosome(problem, GeneTable.decode(encoded))
+    best, best_score = current, current.update_internal()
+    for i in range(iterations):
+        current = _simulated_annealing(current, cooling_function, rng, sa_iterations, temp,
+                                       cumulative=i * sa_iterations)
+        score = current.update_internal()
+        if score > best_score:
+            best, best_score = current, score
+
+        # a single write per line, the chains share the output
+        print("CHAIN %d | ITERATION %d OF %d | SCORE: %s\n" % (chain, i + 1, iterations, score), end="", flush=True)
+        current = rounds.exchange(chain, current, score)
+
+    results.put((chain, best_score, best.clean().genes.encode()))
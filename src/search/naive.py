@@ -1,13 +1,14 @@
 import math
-from copy import deepcopy
 
 import objects.primitives as prim
+from objects.spatial import SpatialIndex
 
 
-def deliver_genes(orders) -> list[prim.Gene]:
+def deliver_genes(problem: prim.Problem, orders) -> list[prim.Gene]:
     """
     Calculates the genes necessary for the delivery operations
 
+    :param problem: problem of the orders
     :param orders: problem's orders
     :return: a list containing the genes calculated
     """
@@ -16,9 +17,9 @@ def deliver_genes(orders) -> list[prim.Gene]:
     for order in orders:
         i += 1
         for product_id, quantity in order.products.items():
-            product = prim.Problem.get_product(product_id)
+            product = problem.get_product(product_id)
             remaining = quantity
-            max_product = math.floor(prim.Problem.payload / product.weight)  # max products per drone
+            max_product = math.floor(problem.payload / product.weight)  # max products per drone
             drones_needed = math.ceil(quantity / max_product)
 
             for i in range(drones_needed - 1):
@@ -46,33 +47,34 @@ def calculate_product(warehouse_available, needed) -> tuple[int, int]:
         return 0, still_need
 
 
-def naive_solution() -> prim.Chromosome:
+def naive_solution(problem: prim.Problem) -> prim.Chromosome:
     """
     Naive algorithm for the problem
 
+    :param problem: problem to solve
     :return: a naive solution
     """
-    wh_copy = deepcopy(prim.Problem.warehouses)
-    chromosome = prim.Chromosome()
+    stock = prim.StockIndex(problem.stock)
+    index = SpatialIndex(problem, stock)
+    chromosome = prim.Chromosome(problem)
     drone = 0
 
-    supplier_genes = deliver_genes(prim.Problem.orders)
+    supplier_genes = deliver_genes(problem, problem.orders)
     for gene in supplier_genes:
         remaining_product = abs(gene.demand)  # demand product
-        for warehouse in wh_copy:
-            if warehouse.products.get(gene.product.id) is not None:
-                wh_quantity, needed = calculate_product(warehouse.products.get(gene.product.id), remaining_product)
-                if wh_quantity < warehouse.products.get(gene.product.id):
-                    chromosome.add_gene(
-                        prim.Gene(drone, remaining_product - needed, warehouse, gene.product))  # add gene with pick up
+        # picks up from the warehouses with stock, nearest to the order first
+        for warehouse in index.nearest_warehouses(problem.node_index(gene.node), gene.product.id):
+            _, needed = calculate_product(stock.quantity(warehouse.id, gene.product.id), remaining_product)
+            chromosome.add_gene(
+                prim.Gene(drone, remaining_product - needed, warehouse, gene.product))  # add gene with pick up
 
-                    warehouse.products.update({gene.product.id: wh_quantity})  # updates warehouse product
-                    remaining_product = needed  # decrement demand product
-                if remaining_product == 0:  # when demand is 0 we can add gene corresponding to delivery
-                    gene.set_drone(drone)
-                    chromosome.add_gene(gene)
-                    drone += 1
-                    if drone > prim.Problem.drones - 1:
-                        drone = 0
-                    break
+            stock.reserve(warehouse.id, gene.product.id, remaining_product - needed)  # updates warehouse product
+            remaining_product = needed  # decrement demand product
+            if remaining_product == 0:  # when demand is 0 we can add gene corresponding to delivery
+                gene.set_drone(drone)
+                chromosome.add_gene(gene)
+                drone += 1
+                if drone > problem.drones - 1:
+                    drone = 0
+                break
     return chromosome
@@ -0,0 +1,140 @@
+import concurrent.futures
+import os
+import queue
+
+import numpy as np
+
+import objects.primitives as prim
+import search.greedy_solution as greed
+
+
+# problem of the processes of a pool, set once by the initializer of each process (see process_pool)
+_problem: prim.Problem = None
+
+
+def process_pool(problem: prim.Problem, workers: int = None) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Creates a pool of processes that already hold a problem, it is sent to each process only once
+
+    :param problem: problem of the tasks sent to the pool
+    :param workers: number of processes, defaults to the number of cores
+    :return: the pool, to be used as a context manager
+    """
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_set_problem, initargs=(problem,))
+
+
+def _set_problem(problem: prim.Problem) -> None:
+    """
+    Initializer of the processes of a pool (see process_pool)
+
+    :param problem: problem of the tasks sent to the pool
+    """
+    global _problem
+    _problem = problem
+
+
+def chunk_size(tasks: int, workers: int = None) -> int:
+    """
+    Number of tasks sent to a process at once, a few chunks per process keep them busy without much messaging
+
+    :param tasks: number of tasks
+    :param workers: number of processes, defaults to the number of cores
+    :return: tasks per chunk
+    """
+    return max(1, tasks // (4 * (workers or os.cpu_count() or 1)))
+
+
+def spawn(rng: np.random.Generator, n: int) -> list[np.random.Generator]:
+    """
+    Independent random generators for the tasks of other processes, derived from a generator so a seeded run gives
+    every task the same stream again. Their seeds are spread by a SeedSequence, so the streams never overlap
+
+    :param rng: random generator of this process, it advances by a single draw
+    :param n: number of generators
+    :return: list of generators
+    """
+    seed = np.random.SeedSequence(rng.integers(0, 2 ** 63, size=4).tolist())
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
+
+
+def build_solution(rng: np.random.Generator) -> np.ndarray:
+    """
+    Builds a solution with the random greedy algorithm (see greedy_solution), runs on a process of the pool
+
+    :param rng: random generator of the task (see spawn)
+    :return: encoded genes of the solution (see GeneTable.encode)
+    """
+    return greed.greedy_solution(_problem, False, rng).genes.encode()
+
+
+def evaluate_solution(encoded: np.ndarray) -> tuple[float, int]:
+    """
+    Evaluates a solution, runs on a process of the pool
+
+    :param encoded: encoded genes of the solution (see GeneTable.encode)
+    :return: score of the solution (including penalties) and its penalty
+    """
+    chromosome = prim.Chromosome(_problem, prim.GeneTable.decode(encoded))
+    return chromosome.update_internal(), chromosome.penalty
+
+
+class RoundBest:
+    def __init__(self, context, parties: int):
+        """
+        Best solution of each round of a group of processes. At the end of a round every process shares the score of
+        its solution and waits for the others, then the processes behind the best one receive its genes. The best is
+        the highest score, the lowest index winning the ties, so what each process continues from only depends on the
+        solutions of the round and not on the order the processes reach its end
+        :param context: multiprocessing context of the processes
+        :param parties: number of processes, each one takes part in every round
+        """
+        self.scores = context.Array('d', parties, lock=False)
+        self.barrier = context.Barrier(parties)
+        self.inboxes = [context.Queue() for _ in range(parties)]
+
+    def exchange(self, index: int, chromosome: prim.Chromosome, score: float) -> prim.Chromosome:
+        """
+        Ends a round for a process, waiting for every other process to end it
+        :param index: index of the process
+        :param chromosome: solution of the process
+        :param score: score of the solution (including penalties)
+        :return: the solution to continue from, a copy of the best one if the solution is behind it
+        """
+        self.scores[index] = score
+        self.barrier.wait()
+        scores = self.scores[:]
+        self.barrier.wait()  # every process has read the scores of this round before they change
+
+        best = max(range(len(scores)), key=lambda i: (scores[i], -i))
+        if index == best:
+            encoded = chromosome.genes.encode()
+            for i, other in enumerate(scores):
+                if other < scores[best]:
+                    self.inboxes[i].put(encoded)
+            return chromosome
+        if score < scores[best]:
+            return prim.Chromosome(chromosome.problem, prim.GeneTable.decode(self.inboxes[index].get()))
+        return chromosome
+
+
+def collect(results, processes: list, count: int) -> list:
+    """
+    Waits for the results of some processes, stopping every process if one of them dies before sending its result
+
+    :param results: queue receiving the results
+    :param processes: the started processes
+    :param count: number of results to wait for
+    :return: list with the results, in the order they were received
+    """
+    received = []
+    while len(received) < count:
+        try:
+            received.append(results.get(timeout=1))
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                for process in processes:
+                    process.terminate()
+                raise RuntimeError("A worker process stopped unexpectedly")
+    for process in processes:
+        process.join()
+    return received
@@ -0,0 +1,196 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class ProgressSink(ABC):
+    def __init__(self, every: int = 1):
+        """
+        Receives the progress of a search, one record per iteration (or generation), keeping one record out of every
+        few of them. The records are dictionaries of numbers with the same keys for the same search, the first one
+        being the iteration: iteration and value for the hill climbing, iteration, best, current and temperature for
+        the simulated annealing, generation, best and mean for the genetic algorithm
+        :param every: one record is kept out of this many, 1 keeps all of them
+        """
+        self.every = every
+        self.received = 0
+
+    def record(self, values: dict) -> None:
+        """
+        Receives the record of an iteration
+        :param values: the record
+        """
+        if self.received % self.every == 0:
+            self.write(values)
+        self.received += 1
+
+    @abstractmethod
+    def write(self, values: dict) -> None:
+        """
+        Keeps a record
+        :param values: the record
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        Releases the resources of the sink, it receives no more records
+        """
+        pass
+
+    def __enter__(self) -> ProgressSink:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+class CsvSink(ProgressSink):
+    def __init__(self, path: str, every: int = 1):
+        """
+        Appends the records to a CSV file, one line per record, written as soon as they are received so the file can
+        be followed while the search runs. A header with the keys is written before the first record and whenever
+        the keys change, such as when the next stage of a pipeline starts
+        :param path: path of the file, appended to if it exists
+        :param every: one record is kept out of this many
+        """
+        super().__init__(every)
+        self.file = open(path, 'a', buffering=1)  # line buffered
+        self.__keys = None
+
+    def write(self, values: dict) -> None:
+        keys = tuple(values)
+        if keys != self.__keys:
+            self.__keys = keys
+            self.file.write(','.join(keys) + '\n')
+        self.file.write(','.join(map(str, values.values())) + '\n')
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class RingSink(ProgressSink):
+    def __init__(self, fields: tuple, size: int = 4096, path: str = None, every: int = 1):
+        """
+        Keeps the last records in a fixed array of float64, one row per record and one column per field. With a path
+        the array is a .npy file mapped in memory, which other processes can read while the search runs
+        (see read_ring)
+        :param fields: keys of the records, in order
+        :param size: number of records kept, the oldest ones are overwritten
+        :param path: path of the .npy file, None keeps the array in memory
+        :param every: one record is kept out of this many
+        """
+        super().__init__(every)
+        self.fields = tuple(fields)
+        shape = (size, len(self.fields) + 1)  # the first column numbers the records, -1 on the empty rows
+        if path is None:
+            self.rows = np.full(shape, -1.0)
+        else:
+            self.rows = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+            self.rows[:] = -1.0
+        self.written = 0
+
+    def write(self, values: dict) -> None:
+        row = self.rows[self.written % len(self.rows)]
+        row[0] = -1.0  # a reader never takes a row being written as complete, it is numbered once it is
+        row[1:] = [values[field] for field in self.fields]
+        row[0] = self.written
+        self.written += 1
+
+    def data(self) -> dict[str, list]:
+        """
+        Records kept, oldest first
+        :return: dictionary with the values of each field
+        """
+        return _ring_data(self.rows, self.fields)
+
+    def close(self) -> None:
+        if isinstance(self.rows, np.memmap):
+            self.rows.flush()
+
+
+def read_ring(path: str, fields: tuple) -> dict[str, list]:
+    """
+    Reads the records of the file of a RingSink, which may still be written
+    :param path: path of the .npy file
+    :param fields: keys of the records, as given to the RingSink
+    :return: dictionary with the values of each field, oldest first
+    """
+    return _ring_data(np.load(path, mmap_mode='r'), fields)
+
+
+def _ring_data(rows: np.ndarray, fields: tuple) -> dict[str, list]:
+    """
+    Records of the rows of a RingSink
+    :param rows: array of the records
+    :param fields: keys of the records
+    :return: dictionary with the values of each field, oldest first
+    """
+    rows = np.array(rows)
+    rows = rows[rows[:, 0] >= 0]
+    rows = rows[np.argsort(rows[:, 0], kind='stable')]
+    return {field: rows[:, i + 1].tolist() for i, field in enumerate(fields)}
+
+
+class CallbackSink(ProgressSink):
+    def __init__(self, callback, every: int = 1):
+        """
+        Calls a function with each record
+        :param callback: function receiving the record
+        :param every: one record is kept out of this many
+        """
+        super().__init__(every)
+        self.callback = callback
+
+    def write(self, values: dict) -> None:
+        self.callback(values)
+
+
+class SampleSink(ProgressSink):
+    def __init__(self, size: int = 2048):
+        """
+        Keeps records spread over the whole search in a bounded memory, to plot it (see search.reporting). Once
+        it holds size records, every other record is dropped and only half as many records are kept from then on
+        :param size: maximum number of records kept, besides the last one received
+        """
+        super().__init__(1)
+        self.size = size
+        self.records: list[dict] = []
+        self.last = None
+
+    def record(self, values: dict) -> None:
+        self.last = values
+        super().record(values)
+
+    def write(self, values: dict) -> None:
+        self.records.append(values)
+        if len(self.records) > self.size:
+            self.records = self.records[::2]
+            self.every *= 2
+
+    def data(self) -> dict[str, list]:
+        """
+        Records kept, along with the last one received
+        :return: dictionary with the values of each key, in the order they were received
+        """
+        records = self.records if not self.records or self.records[-1] is self.last else self.records + [self.last]
+        return {key: [values[key] for values in records] for key in (self.last or {})}
+
+
+class MultiSink(ProgressSink):
+    def __init__(self, *sinks: ProgressSink):
+        """
+        Sends each record to several sinks, each one keeping its own share of them
+        :param sinks: the sinks, None's are ignored
+        """
+        super().__init__(1)
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def write(self, values: dict) -> None:
+        for sink in self.sinks:
+            sink.record(values)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,93 @@
+# Optional reporting layer: the solvers import this module only when a plot is requested, so pandas and matplotlib
+# are not loaded by batch runs
+import matplotlib.pyplot as plt
+import pandas as pd
+
+
+def plot_hill_climbing(data: dict) -> None:
+    """
+    Plots the data acquired on the hill climbing algorithm
+
+    :param data: data containing iterations and values
+    """
+
+    plt.plot(data['iteration'], data['value'])
+    plt.xlabel("Iteration")
+    plt.ylabel("Value")
+    plt.title("Hill Climbing")
+
+    best_score = max(data['value'])
+    xpos = data['value'].index(best_score)
+    xmax = data['iteration'][xpos]
+
+    plt.gca().annotate(str(best_score) + " (max)", xy=(xmax, best_score), xytext=(xmax, best_score + 5),
+                       arrowprops=dict(facecolor='black', shrink=0.05),
+                       )
+
+    plt.gca().set_ylim(min(data['value']) - 10, 110)
+
+    fig = plt.gcf()
+    fig.set_size_inches(15.5, 10.5)
+
+
+def plot_simulated_annealing(data: dict) -> None:
+    """
+    Plots the data acquired on the simulated annealing algorithm
+
+    :param data: data containing iterations, best values and temperatures
+    """
+
+    df = pd.DataFrame(data=data)
+
+    fig, ax = plt.subplots()
+
+    df.plot(x='iteration', y='current', ax=ax)
+    df.plot(x='iteration', y='best', ax=ax)
+    df.plot(x='iteration', y='temperature', ax=ax, secondary_y=True)
+
+    best_score = max(data['best'])
+    xpos = data['best'].index(best_score)
+    xmax = data['iteration'][xpos]
+
+    ax.annotate(str(best_score) + " (max)", xy=(xmax, best_score), xytext=(xmax, best_score + 5),
+                arrowprops=dict(facecolor='black', shrink=0.05),
+                )
+
+    ax.set_ylim(min(data['current']) - 10, 110)
+    fig.set_size_inches(18.5, 10.5)
+    ax.set_title('Simulated Annealing')
+
+
+def plot_genetic_algorithm(data: dict) -> None:
+    """
+    Plots the data acquired on the genetic algorithm
+
+    :param data: data containing generations, best values and mean values
+    """
+
+    df = pd.DataFrame(data=data)
+
+    fig, ax = plt.subplots()
+
+    df.plot(x='generation', y='best', ax=ax)
+    df.plot(x='generation', y='mean', ax=ax)
+
+    best_score = max(data['best'])
+    xpos = data['best'].index(best_score)
+    xmax = data['generation'][xpos]
+
+    ax.annotate(str(best_score) + "(generation = " + str(xmax) + ")", xy=(xmax, best_score),
+                xytext=(xmax, best_score + 5), arrowprops=dict(facecolor='black', shrink=0.05),
+                )
+
+    ax.set_ylim(min(data['mean']) - 10, 110)
+    fig.set_size_inches(18.5, 11.5)
+    ax.set_title('Genetic Algorithms')
+    ax.set_ylabel('Score')
+
+
+def show() -> None:
+    """
+    Displays the plots created
+    """
+    plt.show()
@@ -0,0 +1,275 @@
+import argparse
+import contextlib
+import json
+import sys
+from timeit import default_timer as timer
+
+import numpy as np
+
+import objects.primitives as prim
+from objects.export import export_data
+import objects.profiling as profiling
+from search.budget import Budget
+from search.progress import CsvSink, ProgressSink
+from objects.simulator import best_official, path_commands, simulate
+import search.genetic_algorithm as gen
+import search.greedy_solution as greedy
+import search.heuristics as heur
+import search.naive as dat
+
+COOLING_FUNCTIONS = {
+    "exponential": heur.CoolingFunctions.exponential,
+    "linear": heur.CoolingFunctions.linear,
+    "quadratic": heur.CoolingFunctions.quadratic,
+    "logarithmic": heur.CoolingFunctions.logarithmic,
+}
+
+DEFAULT_PARAMETERS = {
+    "hc_iterations": 100,       # hill climbing
+    "ls_iterations": 1000,      # local search, moves tried
+    "sa_iterations": 100,       # simulated annealing, each run on the iterative and parallel versions
+    "isa_iterations": 3,        # runs of the iterative and parallel simulated annealing
+    "temperature": 100,
+    "cooling": "exponential",
+    "chains": None,             # parallel simulated annealing, None uses every core
+    "generations": 10,          # genetic algorithm
+    "population": 20,
+    "crossover": 0.8,
+    "mutation": 0.5,
+    "workers": 1,
+    "islands": None,            # island genetic algorithm, None uses every core
+    "interval": 10,
+    "migrants": 2,
+    "topology": "ring",
+}
+
+
+# --- Stages of a pipeline, called with the problem, the solution of the previous stage, the budget of the stage (None
+# without a time limit nor checkpoints), the sink of the progress (None to not record it) and the random generator of
+# the run. The constructors ignore the solution and the optimizers ignore the problem, it is held by the solution.
+# Only the genetic algorithm and the single process optimizers use the budget and the sink, the stages running on
+# several processes (UNBOUNDED) can't be given a time limit, checkpoints nor a sink (see check_budget)
+def _greedy(problem: prim.Problem, _, parameters: dict, budget: Budget, progress: ProgressSink,
+            rng: np.random.Generator) -> prim.Chromosome:
+    return greedy.greedy_solution(problem, True)
+
+
+def _random(problem: prim.Problem, _, parameters: dict, budget: Budget, progress: ProgressSink,
+            rng: np.random.Generator) -> prim.Chromosome:
+    return greedy.greedy_solution(problem, False, rng)
+
+
+def _naive(problem: prim.Problem, _, parameters: dict, budget: Budget, progress: ProgressSink,
+           rng: np.random.Generator) -> prim.Chromosome:
+    return dat.naive_solution(problem)
+
+
+def _genetic(problem: prim.Problem, _, parameters: dict, budget: Budget, progress: ProgressSink,
+             rng: np.random.Generator) -> prim.Chromosome:
+    return gen.genetic_algorithm(problem, parameters["generations"], parameters["population"], parameters["crossover"],
+                                 parameters["mutation"], parameters["workers"], plot=False, budget=budget,
+                                 progress=progress, rng=rng)[0]
+
+
+def _island_genetic(problem: prim.Problem, _, parameters: dict, budget: Budget, progress: ProgressSink,
+                    rng: np.random.Generator) -> prim.Chromosome:
+    return gen.island_genetic_algorithm(problem, parameters["generations"], parameters["population"],
+                                        parameters["crossover"], parameters["mutation"], parameters["islands"],
+                                        parameters["interval"], parameters["migrants"], parameters["topology"],
+                                        rng)[0]
+
+
+def _hill_climbing(_, solution: prim.Chromosome, parameters: dict, budget: Budget, progress: ProgressSink,
+                   rng: np.random.Generator) -> prim.Chromosome:
+    return heur.hill_climbing(solution, parameters["hc_iterations"], plot=False, budget=budget, progress=progress,
+                              rng=rng)
+
+
+def _local_search(_, solution: prim.Chromosome, parameters: dict, budget: Budget, progress: ProgressSink,
+                  rng: np.random.Generator) -> prim.Chromosome:
+    return heur.local_search(solution, parameters["ls_iterations"], budget=budget, progress=progress, rng=rng)
+
+
+def _sim_an(_, solution: prim.Chromosome, parameters: dict, budget: Budget, progress: ProgressSink,
+            rng: np.random.Generator) -> prim.Chromosome:
+    return heur.simulated_annealing(solution, COOLING_FUNCTIONS[parameters["cooling"]], parameters["sa_iterations"],
+                                    parameters["temperature"], plot=False, budget=budget, progress=progress,
+                                    rng=rng)
+
+
+def _it_sim_an(_, solution: prim.Chromosome, parameters: dict, budget: Budget, progress: ProgressSink,
+               rng: np.random.Generator) -> prim.Chromosome:
+    return heur.iterative_simulated_annealing(solution, COOLING_FUNCTIONS[parameters["cooling"]],
+                                              parameters["isa_iterations"], parameters["sa_iterations"],
+                                              parameters["temperature"], plot=False, budget=budget, progress=progress,
+                                              rng=rng)
+
+
+def _par_sim_an(_, solution: prim.Chromosome, parameters: dict, budget: Budget, progress: ProgressSink,
+                rng: np.random.Generator) -> prim.Chromosome:
+    return heur.parallel_simulated_annealing(solution, None, parameters["isa_iterations"],
+                                             parameters["sa_iterations"], parameters["temperature"],
+                                             parameters["chains"], rng)
+
+
+CONSTRUCTORS = {"greedy": _greedy, "random": _random, "naive": _naive, "ga": _genetic, "islands": _island_genetic}
+OPTIMIZERS = {"hc": _hill_climbing, "ls": _local_search, "sa": _sim_an, "isa": _it_sim_an, "psa": _par_sim_an}
+UNBOUNDED = {"islands", "psa"}  # stages ignoring the budget and the sink
+
+
+def parse_pipeline(pipeline: str) -> list[str]:
+    """
+    Splits a pipeline such as "greedy+sa" in its stages, a constructor followed by any number of optimizers
+
+    :param pipeline: names of the stages joined by "+"
+    :return: list with the names of the stages
+    """
+    stages = [stage.strip() for stage in pipeline.split("+")]
+    if stages[0] not in CONSTRUCTORS:
+        raise ValueError("A pipeline must start with one of: " + ", ".join(CONSTRUCTORS))
+    for stage in stages[1:]:
+        if stage not in OPTIMIZERS:
+            raise ValueError("Unknown optimizer '{0}', expected one of: {1}".format(stage, ", ".join(OPTIMIZERS)))
+    return stages
+
+
+def check_budget(stages: list[str], budget: Budget = None, recorded: bool = False) -> None:
+    """
+    Checks that the stages of a pipeline can follow the limits and the sink of a run, the stages running on several
+    processes ignore them (see UNBOUNDED)
+
+    :param stages: names of the stages (see parse_pipeline)
+    :param budget: time limit and checkpoints of the run, None for neither
+    :param recorded: flag of a sink receiving the progress of the run
+    """
+    unbounded = [stage for stage in stages if stage in UNBOUNDED]
+    if not unbounded:
+        return
+    if budget is not None and (budget.deadline is not None or budget.checkpoint is not None or budget.resume):
+        raise ValueError("A time limit and checkpoints can't be used with the stages: " + ", ".join(unbounded))
+    if recorded:
+        raise ValueError("The progress can't be recorded with the stages: " + ", ".join(unbounded))
+
+
+def solve(input_file: str, pipeline: str = "greedy", output: str = None, seed: int = None, use_cache: bool = True,
+          budget: Budget = None, progress: ProgressSink = None, **parameters) -> prim.Chromosome:
+    """
+    Solves a problem file with a pipeline of algorithms, without any interaction or plots
+
+    :param input_file: path to the .in file
+    :param pipeline: names of the stages joined by "+" (see parse_pipeline)
+    :param output: path of the submission file written with export_data (gzip if it ends in .gz), None to skip it
+    :param seed: seed of the random generator of the run, None for a random seed
+    :param use_cache: flag to read and write the compiled problem next to the input file (see Problem.read)
+    :param budget: time limit and checkpoints shared by the stages (see Budget and check_budget), each stage saves its
+    own checkpoint file, named after the one of the budget followed by the position and name of the stage
+    :param progress: sink receiving the progress of the searches of every stage (see ProgressSink)
+    :param parameters: parameters of the algorithms (see DEFAULT_PARAMETERS)
+    :return: the best solution of the stages by the official score (see objects.simulator.official_rank)
+    """
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise TypeError("Unknown parameters: " + ", ".join(sorted(unknown)))
+    if parameters.get("cooling", DEFAULT_PARAMETERS["cooling"]) not in COOLING_FUNCTIONS:
+        raise ValueError("Unknown cooling function: " + str(parameters["cooling"]))
+    parameters = {**DEFAULT_PARAMETERS, **parameters}
+    stages = parse_pipeline(pipeline)
+    check_budget(stages, budget, progress is not None)
+
+    rng = np.random.default_rng(seed)
+    problem = prim.Problem.read(input_file, use_cache)
+    solution = None
+    candidates = []
+    for i, stage in enumerate(stages):
+        function = (CONSTRUCTORS if solution is None else OPTIMIZERS)[stage]
+        stage_budget = None if budget is None else budget.stage("{0}-{1}".format(i, stage))
+        if profiling.active is None:
+            solution = function(problem, solution, parameters, stage_budget, progress, rng)
+        else:
+            with profiling.active.timer('stage.' + stage):
+                solution = function(problem, solution, parameters, stage_budget, progress, rng)
+        candidates.append(solution)
+
+    # the solutions of the stages are ranked by the official score, the later stages win the ties
+    solution = best_official(candidates[::-1]) if len(candidates) > 1 else solution
+    solution.update_internal()
+
+    if output is not None:
+        export_data(solution.solution, output)
+    return solution
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line interface of solve
+
+    :param argv: command line arguments, defaults to sys.argv
+    :return: exit status
+    """
+    parser = argparse.ArgumentParser(description="Solve a drone delivery problem without any interaction")
+    parser.add_argument("input", help="path to the .in file")
+    parser.add_argument("-p", "--pipeline", default="greedy",
+                        help="stages joined by '+': one of {0}, then any of {1} (default: greedy)"
+                        .format(", ".join(CONSTRUCTORS), ", ".join(OPTIMIZERS)))
+    parser.add_argument("-o", "--output", help="path of the submission file (compressed with gzip if it ends in .gz)")
+    parser.add_argument("-s", "--seed", type=int, help="seed of the random generator (default: a random seed)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="don't read or write the compiled problem next to the input file")
+    parser.add_argument("--profile", help="path of the JSON file with the counters and timers of the run")
+    parser.add_argument("--metadata", help="path of the JSON file describing the run: its seed, parameters and scores")
+    parser.add_argument("--time-limit", type=float,
+                        help="seconds of the run, the searches stop at their next iteration once they are over")
+    parser.add_argument("--checkpoint", help="path of the checkpoint files, saved while searching")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                        help="seconds between checkpoints and exports of the best solution so far (default: 60)")
+    parser.add_argument("--resume", action="store_true", help="continue the searches from their checkpoint files")
+    parser.add_argument("--progress", help="path of the CSV file the progress of the searches is appended to")
+    parser.add_argument("--progress-every", type=int, default=1,
+                        help="iterations (or generations) per line of the progress file (default: 1)")
+    for name, default in DEFAULT_PARAMETERS.items():
+        kind = {"crossover": float, "mutation": float, "cooling": str, "topology": str}.get(name, int)
+        choices = {"cooling": list(COOLING_FUNCTIONS), "topology": ["ring", "all"]}.get(name)
+        parser.add_argument("--" + name.replace("_", "-"), type=kind, default=default, choices=choices,
+                            help="(default: {0})".format(default))
+    arguments = vars(parser.parse_args(argv))
+
+    input_file, pipeline = arguments.pop("input"), arguments.pop("pipeline")
+    output, seed, use_cache = arguments.pop("output"), arguments.pop("seed"), arguments.pop("use_cache")
+    profile, metadata = arguments.pop("profile"), arguments.pop("metadata")
+    progress_file, progress_every = arguments.pop("progress"), arguments.pop("progress_every")
+    budget = Budget(arguments.pop("time_limit"), arguments.pop("checkpoint"), arguments.pop("checkpoint_interval"),
+                    output, arguments.pop("resume"))
+    try:
+        stages = parse_pipeline(pipeline)
+        check_budget(stages, budget, progress_file is not None)
+    except ValueError as error:
+        parser.error(str(error))
+    # the processes of the unbounded stages can't be stopped cleanly, the signals keep interrupting them
+    signals = contextlib.nullcontext() if UNBOUNDED.intersection(stages) else budget
+    if seed is None:  # a seed is always chosen here, so every run can be repeated
+        seed = np.random.SeedSequence().entropy
+
+    start = timer()
+    with profiling.profile() if profile else contextlib.nullcontext() as profiler, signals, \
+            CsvSink(progress_file, progress_every) if progress_file else contextlib.nullcontext() as progress:
+        solution = solve(input_file, pipeline, output, seed, use_cache, budget, progress, **arguments)
+    took = timer() - start
+    if profile:
+        with open(profile, "w") as file:
+            json.dump(profiler.metrics(), file, indent=2)
+    result = simulate(solution.problem, path_commands(solution.solution)).result()
+    print("{file} | {pipeline} | Score: {score} | Penalty: {penalty} | Official Score: {official}{valid} | "
+          "Seed: {seed} | Took: {time} seconds".format(file=input_file, pipeline=pipeline, score=solution.score,
+                                                       penalty=solution.penalty, official=result["score"],
+                                                       valid="" if result["valid"] else " (invalid)", seed=seed,
+                                                       time=took))
+    if metadata:
+        with open(metadata, "w") as file:
+            json.dump({"input": input_file, "pipeline": pipeline, "seed": seed, "parameters": arguments,
+                       "output": output, "score": solution.score, "penalty": solution.penalty,
+                       "official_score": result["score"], "valid": result["valid"], "time": took}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
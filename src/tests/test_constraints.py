@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from search.constraints import check_delivery
+
+
+def step_by_step_delivery(demands: list[int], products: list[int]) -> list[int]:
+    """
+    The delivery check walking the genes one by one, as it was before working on arrays
+
+    :param demands: quantity of each gene of a drone, positive for loads and negative for deliveries
+    :param products: identifier of the product of each gene
+    :return: 1 for the genes where the constraint was unfulfilled, 0 for the others
+    """
+    penalties = [0] * len(demands)
+    stock = {}
+    for i, (demand, product_id) in enumerate(zip(demands, products)):
+        if demand > 0:
+            stock[product_id] = stock.get(product_id, 0) + demand
+        elif product_id not in stock or abs(demand) > stock[product_id]:
+            penalties[i] = 1
+        else:
+            stock[product_id] += demand
+    return penalties
+
+
+class CheckDeliveryTest(unittest.TestCase):
+    def assert_step_by_step(self, demands: np.ndarray, products: np.ndarray) -> None:
+        expected = step_by_step_delivery(demands.tolist(), products.tolist())
+        self.assertEqual(check_delivery(demands, products).tolist(), expected)
+
+    def test_empty_path(self):
+        self.assert_step_by_step(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32))
+
+    def test_failed_delivery_leaves_the_stock(self):
+        # the second delivery fails, so the third one still finds the 3 items
+        demands = np.array([-1, 4, -2, -5, -2, 0, -1], dtype=np.int32)
+        self.assert_step_by_step(demands, np.zeros(len(demands), dtype=np.int32))
+
+    def test_random_paths(self):
+        rng = np.random.default_rng(5)
+        for _ in range(500):
+            n = int(rng.integers(1, 60))
+            demands = rng.integers(-6, 6, n).astype(np.int32)
+            products = rng.integers(0, int(rng.integers(1, 5)), n).astype(np.int32)
+            self.assert_step_by_step(demands, products)
+
+    def test_many_failures(self):
+        # a single product whose deliveries mostly fail, settled in one pass
+        rng = np.random.default_rng(7)
+        demands = np.where(rng.random(20000) < 0.2, 3, -2).astype(np.int32)
+        self.assert_step_by_step(demands, np.zeros(len(demands), dtype=np.int32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import argparse
+import sys
+
+import objects.primitives as prim
+from objects.submission import validate_submission
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line interface of validate_submission
+
+    :param argv: command line arguments, defaults to sys.argv
+    :return: exit status, 1 if a submission breaks any rule
+    """
+    parser = argparse.ArgumentParser(description="Check and score submission files of a drone delivery problem")
+    parser.add_argument("input", help="path to the .in file")
+    parser.add_argument("submissions", nargs="+", help="paths of the submission files")
+    parser.add_argument("--max-errors", type=int, default=20, help="violations described per file (default: 20)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="don't read or write the compiled problem next to the input file")
+    arguments = parser.parse_args(argv)
+
+    problem = prim.Problem.read(arguments.input, arguments.use_cache)
+    status = 0
+    for submission in arguments.submissions:
+        result = validate_submission(problem, submission, max_errors=arguments.max_errors)
+        print("{file} | {state} | Score: {score} | Commands: {commands} | Completed Orders: {completed} | "
+              "Turns: {turns}".format(file=submission, state="valid" if result["valid"] else "INVALID", **result))
+        if not result["valid"]:
+            status = 1
+            print("  Violations: " + ", ".join("{0}: {1}".format(rule, count)
+                                               for rule, count in result["violations"].items() if count))
+            for error in result["errors"]:
+                print("  " + error)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())